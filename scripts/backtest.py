@@ -0,0 +1,211 @@
+import os
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import joblib
+from load_data import load_data
+from incremental_update import file_sha256
+from model_io import load_encoders
+from forest_health import calculate_forest_health_index
+from threat_prediction import apply_forecast_variance, select_threat, build_prediction_result, alert_thresholds_met
+from reinforcement_learning import RLAgent, SEVERITY_CATEGORIES
+
+PROPHET_MODELS_PATH = '../models/prophet_models.joblib'
+ENSEMBLE_MODEL_PATH = '../models/ensemble_model.joblib'
+BACKTEST_CACHE_DIR = '../metrics/backtest_cache'
+BACKTEST_RESULTS_PATH = '../metrics/backtest_predictions.csv'
+
+# Models loaded once per worker process by _init_worker
+_worker_models = {}
+
+def forecast_dates(dates, cache_dir=BACKTEST_CACHE_DIR):
+    """
+    Raw Prophet forecasts (temperature, precipitation, severity) for a date
+    vector, one batched predict call per model.
+
+    Results are cached on disk keyed by the Prophet model file hash and the
+    dates, so repeated backtests with unchanged models skip Prophet entirely.
+    """
+    dates = pd.DatetimeIndex(dates)
+    cache_path = None
+    if cache_dir:
+        key = hashlib.sha256((file_sha256(PROPHET_MODELS_PATH) + ','.join(dates.strftime('%Y%m%d'))).encode()).hexdigest()
+        cache_path = os.path.join(cache_dir, f'forecast_{key[:16]}.joblib')
+        if os.path.exists(cache_path):
+            return joblib.load(cache_path)
+
+    temp_model, precip_model, severity_model, _ = joblib.load(PROPHET_MODELS_PATH)
+    future_df = pd.DataFrame({'ds': dates})
+    forecasts = pd.DataFrame({
+        'Date': dates,
+        'temp_raw': temp_model.predict(future_df)['yhat'].values,
+        'precip_raw': precip_model.predict(future_df)['yhat'].values,
+        'severity_raw': severity_model.predict(future_df)['yhat'].values
+    })
+
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        joblib.dump(forecasts, cache_path)
+    return forecasts
+
+def _init_worker():
+    """Loads the ensemble, encoders and a snapshot of the RL agent once per worker."""
+    ohe_threat_type, le_threat_name = load_encoders()
+    agent = RLAgent()
+    agent.load_model()
+    _worker_models.update({
+        'ensemble_model': joblib.load(ENSEMBLE_MODEL_PATH),
+        'ohe_threat_type': ohe_threat_type,
+        'le_threat_name': le_threat_name,
+        'rl_agent': agent
+    })
+
+def _replay_chunk(forecasts):
+    """
+    Runs the post-Prophet part of predict_threats for each forecast row.
+
+    The RL agent learns within the worker's snapshot only and is never saved,
+    so a backtest does not alter the live agent. The tie-break hour is fixed
+    at 0 so results are reproducible.
+    """
+    ensemble_model = _worker_models['ensemble_model']
+    ohe_threat_type = _worker_models['ohe_threat_type']
+    le_threat_name = _worker_models['le_threat_name']
+    agent = _worker_models['rl_agent']
+
+    results = []
+    for row in forecasts.itertuples(index=False):
+        future_date = pd.Timestamp(row.Date)
+        predicted_temp, predicted_precip, predicted_severity, date_seed = apply_forecast_variance(
+            future_date, row.temp_raw, row.precip_raw, row.severity_raw
+        )
+        predicted_threat_name = select_threat(
+            ensemble_model, ohe_threat_type, le_threat_name,
+            predicted_temp, predicted_precip, predicted_severity, future_date, date_seed, hour=0
+        )
+        _, suggested_action, _ = agent.predict_with_feedback(
+            predicted_threat_name, 25.0, 10.0, SEVERITY_CATEGORIES.get(predicted_severity, "Medium")
+        )
+        result = build_prediction_result(
+            future_date, predicted_threat_name, predicted_temp, predicted_precip, predicted_severity, suggested_action
+        )
+        # Keep the timestamp for joining with the actual outcomes
+        result['Date'] = future_date
+        result['Alert'] = alert_thresholds_met(result)
+        results.append(result)
+    return results
+
+def actual_outcomes(df):
+    """
+    Per-date ground truth from the dataset: the dominant (most frequent)
+    threat, its mean severity, and whether the alert rules would have fired
+    on the observed values.
+    """
+    outcomes = []
+    for date, day in df.groupby('Date'):
+        dominant = day['Threat Name'].mode().iloc[0]
+        dominant_rows = day[day['Threat Name'] == dominant]
+        actual_severity = dominant_rows['Severity'].mean()
+        observed = {
+            'Predicted Severity (1-10)': actual_severity,
+            'Predicted Wildlife Impact': dominant_rows['Wildlife Affected'].mode().iloc[0],
+            'Forest Health Index (0-100)': calculate_forest_health_index(
+                day['Temperature (°C)'].mean(), day['Precipitation (mm)'].mean(), date.month
+            )
+        }
+        outcomes.append({
+            'Date': date,
+            'Actual Threat': dominant,
+            'Actual Severity': actual_severity,
+            'Actual Alert': alert_thresholds_met(observed)
+        })
+    return pd.DataFrame(outcomes)
+
+def backtest_metrics(results):
+    """Per-threat accuracy, severity error and alert precision/recall."""
+    correct = results['Most Likely Threat'] == results['Actual Threat']
+    per_threat = {}
+    for threat in sorted(set(results['Actual Threat']) | set(results['Most Likely Threat'])):
+        actual = results['Actual Threat'] == threat
+        predicted = results['Most Likely Threat'] == threat
+        per_threat[threat] = {
+            'support': int(actual.sum()),
+            'recall': float((actual & predicted).sum() / actual.sum()) if actual.any() else None,
+            'precision': float((actual & predicted).sum() / predicted.sum()) if predicted.any() else None
+        }
+
+    severity_error = results['Predicted Severity (1-10)'] - results['Actual Severity']
+    alert_tp = int((results['Alert'] & results['Actual Alert']).sum())
+    return {
+        'dates': len(results),
+        'threat_accuracy': float(correct.mean()),
+        'per_threat': per_threat,
+        'severity_mae': float(severity_error.abs().mean()),
+        'severity_bias': float(severity_error.mean()),
+        'alert_precision': alert_tp / int(results['Alert'].sum()) if results['Alert'].any() else None,
+        'alert_recall': alert_tp / int(results['Actual Alert'].sum()) if results['Actual Alert'].any() else None
+    }
+
+def run_backtest(dates=None, workers=None, use_cache=True):
+    """
+    Replay dates through the full prediction pipeline in parallel.
+
+    Prophet forecasts for all dates are computed once (and cached), then the
+    ensemble, threat selection, RL mitigation and alert rules run across a
+    process pool with models loaded once per worker.
+
+    Args:
+        dates (list, optional): Dates to replay (defaults to every date in the dataset)
+        workers (int, optional): Number of worker processes (defaults to CPU count)
+        use_cache (bool): Reuse cached Prophet forecasts
+
+    Returns:
+        tuple: (results DataFrame, metrics dict or None when there is no ground truth)
+    """
+    df = load_data()
+    if dates is None:
+        dates = df['Date'].drop_duplicates().sort_values()
+    dates = pd.DatetimeIndex(dates)
+
+    forecasts = forecast_dates(dates, BACKTEST_CACHE_DIR if use_cache else None)
+    workers = workers or os.cpu_count()
+    bounds = np.linspace(0, len(forecasts), workers + 1).astype(int)
+    chunks = [forecasts.iloc[a:b] for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        results = pd.DataFrame([r for chunk in pool.map(_replay_chunk, chunks) for r in chunk])
+
+    results = results.merge(actual_outcomes(df), on='Date', how='left')
+    has_actuals = results['Actual Threat'].notna()
+    metrics = backtest_metrics(results[has_actuals]) if has_actuals.any() else None
+    return results, metrics
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay historical dates through the threat prediction pipeline.")
+    parser.add_argument('--start', help="Replay a generated range starting at this date instead of the dataset dates")
+    parser.add_argument('--days', type=int, default=365, help="Length of the generated range")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--no-cache', action='store_true', help="Recompute Prophet forecasts")
+    args = parser.parse_args()
+
+    dates = pd.date_range(args.start, periods=args.days, freq='D') if args.start else None
+
+    start = time.perf_counter()
+    results, metrics = run_backtest(dates, workers=args.workers, use_cache=not args.no_cache)
+    elapsed = time.perf_counter() - start
+
+    os.makedirs(os.path.dirname(BACKTEST_RESULTS_PATH), exist_ok=True)
+    results.to_csv(BACKTEST_RESULTS_PATH, index=False)
+    print(f"Replayed {len(results)} dates in {elapsed:.1f}s. Results saved to {BACKTEST_RESULTS_PATH}")
+
+    if metrics:
+        print(f"\nThreat Accuracy: {metrics['threat_accuracy']:.3f}")
+        print(f"Severity MAE: {metrics['severity_mae']:.2f} (bias {metrics['severity_bias']:+.2f})")
+        print(f"Alert Precision: {metrics['alert_precision']}")
+        print(f"Alert Recall: {metrics['alert_recall']}")
+        print("\nPer-threat:")
+        for threat, m in metrics['per_threat'].items():
+            print(f"  {threat}: support={m['support']} precision={m['precision']} recall={m['recall']}")
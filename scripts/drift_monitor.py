@@ -0,0 +1,288 @@
+import os
+import time
+import math
+import argparse
+import numpy as np
+import pandas as pd
+import joblib
+from load_data import load_data
+from model_io import THREAT_TYPE_CATEGORIES, load_encoders
+
+DRIFT_REFERENCE_PATH = '../models/drift_reference.joblib'
+ENSEMBLE_MODEL_PATH = '../models/ensemble_model.joblib'
+
+# Fixed histogram bins per input: (low edge, bin width, number of bins).
+# Values below/above the range fall into an extra underflow/overflow bin.
+FEATURE_BINS = {
+    'temperature': (-10.0, 2.5, 28),
+    'precipitation': (0.0, 25.0, 32),
+    'severity': (0.5, 1.0, 10)
+}
+
+# Ranges predict_threats clamps its inputs to
+CLAMP_RANGES = {
+    'temperature': (0.0, 40.0),
+    'precipitation': (0.0, 500.0),
+    'severity': (1.0, 10.0)
+}
+
+FEATURES = list(FEATURE_BINS)
+
+def psi(actual, expected, epsilon=1e-4):
+    """Population stability index between two count vectors."""
+    actual = np.asarray(actual, dtype=float)
+    expected = np.asarray(expected, dtype=float)
+    if actual.sum() == 0 or expected.sum() == 0:
+        return 0.0
+    p = np.maximum(actual / actual.sum(), epsilon)
+    q = np.maximum(expected / expected.sum(), epsilon)
+    return float(np.sum((p - q) * np.log(p / q)))
+
+class FeatureStats:
+    """Welford mean/variance, a fixed-bin histogram and a clamp counter for one input."""
+
+    __slots__ = ('low', 'width', 'last_bin', 'clamp_low', 'clamp_high', 'n', 'mean', 'm2', 'counts', 'clamped')
+
+    def __init__(self, name):
+        self.low, self.width, n_bins = FEATURE_BINS[name]
+        self.last_bin = n_bins + 1
+        self.clamp_low, self.clamp_high = CLAMP_RANGES[name]
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.counts = [0] * (n_bins + 2)
+        self.clamped = 0
+
+    def update(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+        position = (x - self.low) / self.width
+        if position < 0:
+            self.counts[0] += 1
+        elif position >= self.last_bin - 1:
+            self.counts[self.last_bin] += 1
+        else:
+            self.counts[int(position) + 1] += 1
+
+        if x < self.clamp_low or x > self.clamp_high:
+            self.clamped += 1
+
+    def std(self):
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+def feature_profile(values, name):
+    """Reference statistics of one input, computed in bulk with the same bins as FeatureStats."""
+    values = np.asarray(values, dtype=float)
+    low, width, n_bins = FEATURE_BINS[name]
+    position = (values - low) / width
+    bins = np.where(position < 0, 0, np.where(position >= n_bins, n_bins + 1, np.floor(position) + 1)).astype(int)
+    clamp_low, clamp_high = CLAMP_RANGES[name]
+    return {
+        'n': len(values),
+        'mean': float(values.mean()),
+        'std': float(values.std(ddof=1)),
+        'counts': np.bincount(bins, minlength=n_bins + 2).tolist(),
+        'clamped_fraction': float(np.mean((values < clamp_low) | (values > clamp_high)))
+    }
+
+def threat_type_rows(ohe_threat_type):
+    """One-hot rows of every threat type, in THREAT_TYPE_CATEGORIES order."""
+    return np.asarray(ohe_threat_type.transform(pd.DataFrame({'Threat Type': THREAT_TYPE_CATEGORIES})))
+
+def threat_probabilities(ensemble_model, threat_type_rows, threat_names, X):
+    """
+    Ensemble probability per threat for rows of (temperature, precipitation,
+    severity): the max over both threat types, with Deforestation damped as
+    in predict_threats.
+
+    Returns:
+        np.ndarray: Shape (rows, threats), columns in threat_names order
+    """
+    X = np.asarray(X, dtype=float)
+    proba = None
+    for threat_type_row in threat_type_rows:
+        X_type = np.hstack([X, np.tile(threat_type_row, (len(X), 1))])
+        type_proba = ensemble_model.predict_proba(pd.DataFrame(X_type, columns=ensemble_model.feature_names_in_))
+        proba = type_proba if proba is None else np.maximum(proba, type_proba)
+    if 'Deforestation' in threat_names:
+        proba[:, list(threat_names).index('Deforestation')] *= 0.5
+    return proba
+
+def build_reference_profile(df=None, save=True):
+    """
+    Reference profile of the training data: input moments and histograms
+    (before clamping, as predict_threats observes them), plus the threat distribution the ensemble predicts on the training rows
+    (max over both threat types with Deforestation damped, as predict_threats does).
+
+    Returns:
+        dict: The profile, also saved next to the models when save is True
+    """
+    if df is None:
+        df = load_data()
+    ensemble_model = joblib.load(ENSEMBLE_MODEL_PATH)
+    ohe_threat_type, le_threat_name = load_encoders()
+    threat_names = list(le_threat_name.classes_)
+
+    temperature = df['Temperature (°C)'].values.astype(float)
+    precipitation = df['Precipitation (mm)'].values.astype(float)
+    severity = df['Severity'].values.astype(float)
+
+    # Model inputs are clamped as in predict_threats before scoring
+    X = np.column_stack([np.clip(temperature, 0, 40), np.clip(precipitation, 0, 500), np.clip(severity, 1, 10)])
+    proba = threat_probabilities(ensemble_model, threat_type_rows(ohe_threat_type), threat_names, X)
+    predictions = np.bincount(proba.argmax(axis=1), minlength=len(threat_names))
+
+    profile = {
+        'features': {
+            'temperature': feature_profile(temperature, 'temperature'),
+            'precipitation': feature_profile(precipitation, 'precipitation'),
+            'severity': feature_profile(severity, 'severity')
+        },
+        'threat_names': threat_names,
+        'prediction_counts': predictions.tolist(),
+        'feature_bins': dict(FEATURE_BINS)
+    }
+    if save:
+        joblib.dump(profile, DRIFT_REFERENCE_PATH)
+    return profile
+
+class DriftMonitor:
+    """
+    Streaming statistics over prediction inputs and outputs, compared against
+    the training reference profile.
+
+    observe_inputs and observe_prediction do a constant amount of pure Python
+    work per call (Welford updates, one histogram increment per input, one
+    class counter increment). snapshot() compares the live statistics with the
+    reference and costs O(bins + classes), independent of how many events
+    were observed.
+    """
+
+    def __init__(self, reference=None):
+        if reference is None:
+            if not os.path.exists(DRIFT_REFERENCE_PATH):
+                raise FileNotFoundError(
+                    f"No drift reference profile at {DRIFT_REFERENCE_PATH}. "
+                    "Run 'python drift_monitor.py --build-reference' or retrain with ensemble_model.py to create it."
+                )
+            reference = joblib.load(DRIFT_REFERENCE_PATH)
+        if reference.get('feature_bins') != FEATURE_BINS:
+            raise ValueError("Reference profile was built with different histogram bins; rebuild it")
+        self.reference = reference
+        self.threat_index = {name: i for i, name in enumerate(reference['threat_names'])}
+        self.reset()
+
+    def reset(self):
+        """Clears the live statistics, e.g. to start a new monitoring window."""
+        self.temperature = FeatureStats('temperature')
+        self.precipitation = FeatureStats('precipitation')
+        self.severity = FeatureStats('severity')
+        self.prediction_counts = [0] * len(self.threat_index)
+        self.unknown_predictions = 0
+
+    def observe_inputs(self, temperature, precipitation, severity=None):
+        self.temperature.update(temperature)
+        self.precipitation.update(precipitation)
+        if severity is not None:
+            self.severity.update(severity)
+
+    def observe_prediction(self, threat_name):
+        index = self.threat_index.get(threat_name)
+        if index is None:
+            self.unknown_predictions += 1
+        else:
+            self.prediction_counts[index] += 1
+
+    def observe(self, temperature, precipitation, severity, threat_name):
+        """Records one prediction's inputs and predicted threat."""
+        self.observe_inputs(temperature, precipitation, severity)
+        self.observe_prediction(threat_name)
+
+    def snapshot(self):
+        """
+        Drift scores of the live statistics against the reference.
+
+        Returns:
+            dict: Per input: count, mean/std, standardized mean shift, std ratio,
+                histogram PSI and clamped fraction (live vs reference). For
+                predictions: count, PSI and the live/reference frequency ratio per threat.
+        """
+        result = {'inputs': {}}
+        for name in FEATURES:
+            live = getattr(self, name)
+            ref = self.reference['features'][name]
+            result['inputs'][name] = {
+                'count': live.n,
+                'mean': live.mean,
+                'std': live.std(),
+                'mean_shift': (live.mean - ref['mean']) / ref['std'] if live.n and ref['std'] else 0.0,
+                'std_ratio': live.std() / ref['std'] if live.n > 1 and ref['std'] else 1.0,
+                'psi': psi(live.counts, ref['counts']),
+                'clamped_fraction': live.clamped / live.n if live.n else 0.0,
+                'reference_clamped_fraction': ref['clamped_fraction']
+            }
+
+        n_predictions = sum(self.prediction_counts)
+        ref_counts = self.reference['prediction_counts']
+        ref_total = sum(ref_counts)
+        frequency_ratio = {}
+        for name, index in self.threat_index.items():
+            ref_frequency = ref_counts[index] / ref_total if ref_total else 0.0
+            live_frequency = self.prediction_counts[index] / n_predictions if n_predictions else 0.0
+            frequency_ratio[name] = live_frequency / ref_frequency if ref_frequency else None
+        result['predictions'] = {
+            'count': n_predictions,
+            'unknown': self.unknown_predictions,
+            'psi': psi(self.prediction_counts, ref_counts),
+            'frequency_ratio': frequency_ratio
+        }
+        return result
+
+    def drifted(self, psi_threshold=0.25, mean_shift_threshold=1.0):
+        """True if any input or the prediction distribution passes the usual PSI/shift thresholds."""
+        snapshot = self.snapshot()
+        for stats in snapshot['inputs'].values():
+            if stats['psi'] > psi_threshold or abs(stats['mean_shift']) > mean_shift_threshold:
+                return True
+        return snapshot['predictions']['psi'] > psi_threshold
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the drift reference profile and benchmark the drift monitor.")
+    parser.add_argument('--build-reference', action='store_true', help="Rebuild the reference profile from the training data")
+    parser.add_argument('--events', type=int, default=200000, help="Events for the overhead benchmark")
+    args = parser.parse_args()
+
+    if args.build_reference:
+        build_reference_profile()
+        print(f"Reference profile saved to {DRIFT_REFERENCE_PATH}")
+
+    monitor = DriftMonitor()
+    threat_names = monitor.reference['threat_names']
+
+    # Replay the training data shifted by +6°C and with heavier rain
+    df = load_data()
+    rng = np.random.default_rng(42)
+    rows = rng.integers(0, len(df), args.events)
+    temperature = (df['Temperature (°C)'].values[rows] + 6).tolist()
+    precipitation = (df['Precipitation (mm)'].values[rows] * 1.2).tolist()
+    severity = df['Severity'].values[rows].astype(float).tolist()
+    threats = [threat_names[i] for i in rng.integers(0, len(threat_names), args.events)]
+
+    start = time.perf_counter()
+    for event in zip(temperature, precipitation, severity, threats):
+        monitor.observe(*event)
+    per_event_us = (time.perf_counter() - start) / args.events * 1e6
+
+    start = time.perf_counter()
+    snapshot = monitor.snapshot()
+    snapshot_us = (time.perf_counter() - start) * 1e6
+
+    print(f"Monitoring overhead: {per_event_us:.2f} µs per prediction, snapshot {snapshot_us:.0f} µs")
+    for name, stats in snapshot['inputs'].items():
+        print(f"{name}: mean shift {stats['mean_shift']:+.2f} std, PSI {stats['psi']:.3f}, "
+              f"clamped {stats['clamped_fraction']:.1%} (reference {stats['reference_clamped_fraction']:.1%})")
+    print(f"predictions: PSI {snapshot['predictions']['psi']:.3f}")
+    print("Drift detected:", monitor.drifted())
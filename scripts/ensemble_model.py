@@ -7,6 +7,7 @@ from sklearn.metrics import classification_report, accuracy_score
 import joblib
 from load_data import load_data
 from sklearn.preprocessing import OneHotEncoder, LabelEncoder
+from drift_monitor import build_reference_profile, DRIFT_REFERENCE_PATH
 
 def train_ensemble():
     """
@@ -62,5 +63,9 @@ def train_ensemble():
     
     print("Ensemble model and encoders saved successfully.")
 
+    # Drift reference profile of the new model's predictions on the training data
+    build_reference_profile()
+    print(f"Drift reference profile saved to {DRIFT_REFERENCE_PATH}")
+
 if __name__ == "__main__":
     train_ensemble()
\ No newline at end of file
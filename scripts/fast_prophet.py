@@ -0,0 +1,174 @@
+import time
+import numpy as np
+import pandas as pd
+import joblib
+
+PROPHET_MODELS_PATH = '../models/prophet_models.joblib'
+
+class FastProphet:
+    """
+    NumPy evaluation of a fitted Prophet model's yhat.
+
+    The fitted trend (rate, offset, changepoint deltas) and the Fourier
+    coefficients of each seasonality are extracted once; yhat for any date
+    array is then the piecewise-linear trend plus the seasonal terms, the same
+    sums Prophet.predict computes, without building its feature DataFrames or
+    sampling uncertainty. Intervals are simulated only when requested, with
+    the vectorized trend-shift sampler of Prophet 1.x.
+
+    Supports linear and flat growth with additive or multiplicative
+    seasonalities, which covers the stored models. Models with holidays,
+    extra regressors or conditional seasonalities are rejected.
+    """
+
+    def __init__(self, model):
+        if model.growth not in ('linear', 'flat'):
+            raise ValueError(f"Unsupported growth for fast inference: {model.growth}")
+        if model.holidays is not None or model.country_holidays is not None or model.extra_regressors:
+            raise ValueError("Fast inference does not support holidays or extra regressors")
+        if any(props['condition_name'] is not None for props in model.seasonalities.values()):
+            raise ValueError("Fast inference does not support conditional seasonalities")
+
+        self.growth = model.growth
+        self.start = model.start
+        self.t_scale = model.t_scale
+        self.y_scale = model.y_scale
+        self.floor = model.y_min if getattr(model, 'scaling', 'absmax') == 'minmax' else 0.0
+        self.changepoints_t = np.asarray(model.changepoints_t, dtype=float)
+        # Step between history points, used for the trend uncertainty of a single future date
+        self.history_t_step = np.diff(model.history['t'].values).mean()
+        self.k = np.nanmean(model.params['k'])
+        self.m = np.nanmean(model.params['m'])
+        self.deltas = np.nanmean(model.params['delta'], axis=0)
+        self.sigma_obs = np.nanmean(model.params['sigma_obs'])
+        self.interval_width = model.interval_width
+        self.uncertainty_samples = model.uncertainty_samples or 1000
+
+        # Seasonal coefficients in the column order of Prophet's feature matrix
+        beta = np.nanmean(model.params['beta'], axis=0)
+        self.seasonalities = []
+        offset = 0
+        for props in model.seasonalities.values():
+            n_terms = 2 * props['fourier_order']
+            self.seasonalities.append((props['period'], props['fourier_order'], props['mode'], beta[offset:offset + n_terms]))
+            offset += n_terms
+        if offset != len(beta):
+            raise ValueError("Seasonal coefficients do not match the model's seasonalities")
+
+    def _t(self, dates):
+        return ((dates - self.start) / self.t_scale).values.astype(float)
+
+    def _trend(self, t):
+        if self.growth == 'flat':
+            return np.full_like(t, self.m)
+        deltas_t = (self.changepoints_t[None, :] <= t[:, None]) * self.deltas
+        k_t = deltas_t.sum(axis=1) + self.k
+        m_t = (deltas_t * -self.changepoints_t).sum(axis=1) + self.m
+        return k_t * t + m_t
+
+    def _trend_uncertainty(self, t, n_samples, rng):
+        """
+        Standardized future trend deviations, as Prophet's _sample_uncertainty:
+        past points get none; future steps get Laplace slope shifts with a
+        change likelihood proportional to the spacing between forecast steps,
+        accumulated into trend offsets.
+        """
+        uncertainty = np.zeros((n_samples, len(t)))
+        if self.growth == 'flat' or t.max() <= 1:
+            return uncertainty
+
+        # Prophet works on the forecast sorted by date
+        future = np.flatnonzero(t > 1)
+        future = future[np.argsort(t[future], kind='stable')]
+        n_length = len(future)
+        step = np.diff(t[future]).mean() if n_length > 1 else self.history_t_step
+        change_likelihood = len(self.changepoints_t) * step
+        mean_delta = np.mean(np.abs(self.deltas)) + 1e-8
+
+        changes = rng.random((n_samples, n_length)) < change_likelihood
+        shifts = rng.laplace(0, mean_delta, (n_samples, n_length)) * changes
+        shifts = (np.hstack([np.zeros((n_samples, 1)), shifts])[:, :-1] + shifts) / 2
+        uncertainty[:, future] = shifts.cumsum(axis=1).cumsum(axis=1) * step
+        return uncertainty
+
+    def _seasonal(self, dates):
+        days = (dates - pd.Timestamp('1970-01-01')).total_seconds().values / (24 * 60 * 60)
+        additive = np.zeros(len(dates))
+        multiplicative = np.zeros(len(dates))
+        for period, order, mode, beta in self.seasonalities:
+            x = 2 * np.pi * np.outer(days, np.arange(1, order + 1)) / period
+            features = np.empty((len(dates), 2 * order))
+            features[:, 0::2] = np.sin(x)
+            features[:, 1::2] = np.cos(x)
+            if mode == 'additive':
+                additive += features @ beta
+            else:
+                multiplicative += features @ beta
+        return additive * self.y_scale, multiplicative
+
+    def predict(self, dates, intervals=False, n_samples=None, seed=None):
+        """
+        Evaluate yhat for an array of dates.
+
+        Args:
+            dates: Anything pd.DatetimeIndex accepts
+            intervals (bool): Also return yhat_lower/yhat_upper from simulated
+                future trend changes and observation noise, as Prophet does
+            n_samples (int, optional): Samples for intervals (defaults to the model's setting)
+            seed (int, optional): Seed for interval sampling
+
+        Returns:
+            pd.DataFrame: Columns ds, yhat (and yhat_lower, yhat_upper with intervals)
+        """
+        dates = pd.DatetimeIndex(dates)
+        t = self._t(dates)
+        additive, multiplicative = self._seasonal(dates)
+        trend = self._trend(t) * self.y_scale + self.floor
+        result = pd.DataFrame({'ds': dates, 'yhat': trend * (1 + multiplicative) + additive})
+
+        if intervals:
+            rng = np.random.default_rng(seed)
+            n_samples = n_samples or self.uncertainty_samples
+            sample_trend = trend + self._trend_uncertainty(t, n_samples, rng) * self.y_scale
+            noise = rng.normal(0, self.sigma_obs, sample_trend.shape) * self.y_scale
+            samples = sample_trend * (1 + multiplicative) + additive + noise
+            result['yhat_lower'] = np.nanpercentile(samples, 100 * (1 - self.interval_width) / 2, axis=0)
+            result['yhat_upper'] = np.nanpercentile(samples, 100 * (1 + self.interval_width) / 2, axis=0)
+
+        return result
+
+def load_fast_prophet_models(path=PROPHET_MODELS_PATH):
+    """Returns FastProphet versions of the stored temperature, precipitation and severity models."""
+    temp_model, precip_model, severity_model, _ = joblib.load(path)
+    return FastProphet(temp_model), FastProphet(precip_model), FastProphet(severity_model)
+
+if __name__ == "__main__":
+    models = joblib.load(PROPHET_MODELS_PATH)[:3]
+    dates = pd.date_range('1900-01-01', periods=365, freq='D')
+    future_df = pd.DataFrame({'ds': dates})
+    # A single current-year date, which is what a "DD Month" input becomes
+    current_date = pd.DatetimeIndex([pd.Timestamp.now().normalize()])
+
+    for name, model in zip(['Temperature', 'Precipitation', 'Severity'], models):
+        start = time.perf_counter()
+        expected = model.predict(future_df)
+        prophet_seconds = time.perf_counter() - start
+
+        fast = FastProphet(model)
+        start = time.perf_counter()
+        actual = fast.predict(dates)
+        fast_seconds = time.perf_counter() - start
+
+        print(f"{name}: max |yhat difference| {np.max(np.abs(actual['yhat'] - expected['yhat'])):.2e}, "
+              f"Prophet {prophet_seconds * 1000:.1f} ms, fast {fast_seconds * 1000:.2f} ms "
+              f"({prophet_seconds / fast_seconds:.0f}x)")
+
+        # Intervals are Monte Carlo estimates on both sides, so compare them loosely
+        for label, check_dates in [('1900 dates', dates), (current_date[0].strftime('%d %B %Y'), current_date)]:
+            expected = model.predict(pd.DataFrame({'ds': check_dates}))
+            actual = fast.predict(check_dates, intervals=True, seed=0)
+            expected_width = (expected['yhat_upper'] - expected['yhat_lower']).values
+            actual_width = (actual['yhat_upper'] - actual['yhat_lower']).values
+            print(f"  intervals ({label}): Prophet [{expected['yhat_lower'].iloc[-1]:.1f}, {expected['yhat_upper'].iloc[-1]:.1f}], "
+                  f"fast [{actual['yhat_lower'].iloc[-1]:.1f}, {actual['yhat_upper'].iloc[-1]:.1f}], "
+                  f"max width ratio {np.max(np.maximum(actual_width / expected_width, expected_width / actual_width)):.2f}")
@@ -0,0 +1,173 @@
+import os
+import time
+import argparse
+import tempfile
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+def seasonal_factor(month):
+    """Returns the seasonal multiplier applied to the forest health index for a month (1-12)."""
+    if 5 <= month <= 8:  # Summer months
+        # Summer can be harder on forests with heat stress
+        return 0.9  # Reduce by 10%
+    elif month >= 11 or month <= 2:  # Winter months
+        # Winter dormancy can show as reduced health
+        return 0.95  # Reduce by 5%
+    return 1.0
+
+def calculate_forest_health_index(predicted_temp, predicted_precip, month=None):
+    """
+    Calculate the forest health index (0-100, higher is better) for one
+    temperature and precipitation value.
+
+    Args:
+        predicted_temp (float): Temperature in °C
+        predicted_precip (float): Precipitation in mm
+        month (int, optional): Month of the forecast date (defaults to the current month)
+    """
+    # Normalize the inputs to ensure a reasonable index
+    # Assuming normal range for temperature: 0-40°C
+    # Assuming normal range for precipitation: 0-500mm
+
+    normalized_temp = max(0, min(40, predicted_temp)) / 40  # 0 to 1 scale
+    normalized_precip = max(0, min(500, predicted_precip)) / 500  # 0 to 1 scale
+
+    # Calculate health index (0-100 scale where higher is better)
+    # More aggressive scaling to allow for lower health index values
+    health_index = 100 - (normalized_temp * 80) + (normalized_precip * 30)
+
+    # Scale final value to ensure full range
+    health_index = max(0, min(100, health_index))
+
+    # Add seasonal variations based on month
+    if month is None:
+        month = datetime.now().month
+    health_index *= seasonal_factor(month)
+
+    return health_index
+
+def forest_health_index_array(temperature, precipitation, month):
+    """
+    Vectorized calculate_forest_health_index over arrays of any shape.
+    Computes in float64 so values match the scalar function.
+    """
+    normalized_temp = np.clip(np.asarray(temperature, dtype=np.float64), 0, 40) / 40
+    normalized_precip = np.clip(np.asarray(precipitation, dtype=np.float64), 0, 500) / 500
+    health_index = np.clip(100 - (normalized_temp * 80) + (normalized_precip * 30), 0, 100)
+    return health_index * seasonal_factor(month)
+
+def _health_tile(args):
+    """Worker: computes one band/row range of the output raster in place."""
+    temp_path, precip_path, out_path, band, row_start, row_end, month = args
+    temperature = np.load(temp_path, mmap_mode='r')
+    precipitation = np.load(precip_path, mmap_mode='r')
+    output = np.load(out_path, mmap_mode='r+')
+
+    if temperature.ndim == 3:
+        temperature, precipitation, output = temperature[band], precipitation[band], output[band]
+
+    output[row_start:row_end] = forest_health_index_array(
+        temperature[row_start:row_end], precipitation[row_start:row_end], month
+    )
+    output.flush()
+    return (row_end - row_start) * output.shape[1]
+
+def compute_health_raster(temp_path, precip_path, out_path, forecast_dates, tile_rows=512, workers=None):
+    """
+    Compute a forest health index raster from gridded temperature and
+    precipitation rasters that may be too large for memory.
+
+    Inputs are .npy files opened memory-mapped, either 2-D (rows x cols) for a
+    single forecast date or 3-D (dates x rows x cols) with one band per date.
+    Row tiles are processed across a process pool and written straight into a
+    memory-mapped float32 .npy output.
+
+    Args:
+        temp_path (str): .npy temperature raster (°C)
+        precip_path (str): .npy precipitation raster (mm)
+        out_path (str): Path of the .npy health index raster to write
+        forecast_dates (list): One date (str or datetime) per band, sets the seasonal factor
+        tile_rows (int): Rows per tile
+        workers (int, optional): Number of worker processes (defaults to CPU count)
+
+    Returns:
+        dict: Output path, pixel count, elapsed seconds and megapixels/sec
+    """
+    temperature = np.load(temp_path, mmap_mode='r')
+    precipitation = np.load(precip_path, mmap_mode='r')
+    if temperature.shape != precipitation.shape:
+        raise ValueError(f"Raster shapes differ: {temperature.shape} vs {precipitation.shape}")
+
+    months = [d.month for d in pd.to_datetime(list(forecast_dates))]
+    n_bands = temperature.shape[0] if temperature.ndim == 3 else 1
+    if len(months) != n_bands:
+        raise ValueError(f"Expected {n_bands} forecast dates, got {len(months)}")
+    rows = temperature.shape[-2]
+
+    output = np.lib.format.open_memmap(out_path, mode='w+', dtype=np.float32, shape=temperature.shape)
+    del output
+
+    tasks = [
+        (temp_path, precip_path, out_path, band, row_start, min(row_start + tile_rows, rows), months[band])
+        for band in range(n_bands)
+        for row_start in range(0, rows, tile_rows)
+    ]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pixels = sum(pool.map(_health_tile, tasks))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'output_path': out_path,
+        'pixels': pixels,
+        'seconds': elapsed,
+        'megapixels_per_sec': pixels / elapsed / 1e6
+    }
+
+def _write_synthetic_raster(path, shape, low, high, seed, tile_rows=1024):
+    """Writes a random float32 raster to .npy tile by tile."""
+    rng = np.random.default_rng(seed)
+    raster = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=shape)
+    for row_start in range(0, shape[0], tile_rows):
+        row_end = min(row_start + tile_rows, shape[0])
+        raster[row_start:row_end] = rng.uniform(low, high, (row_end - row_start, shape[1]))
+    raster.flush()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the chunked forest health index raster computation.")
+    parser.add_argument('--size', type=int, default=4000, help="Raster side length in pixels (e.g. 20000)")
+    parser.add_argument('--date', default=datetime.now().strftime('%Y-%m-%d'), help="Forecast date")
+    parser.add_argument('--tile-rows', type=int, default=512)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        temp_path = os.path.join(tmp, 'temperature.npy')
+        precip_path = os.path.join(tmp, 'precipitation.npy')
+        out_path = os.path.join(tmp, 'health_index.npy')
+
+        shape = (args.size, args.size)
+        _write_synthetic_raster(temp_path, shape, -5, 45, seed=1)
+        _write_synthetic_raster(precip_path, shape, 0, 600, seed=2)
+
+        stats = compute_health_raster(temp_path, precip_path, out_path, [args.date],
+                                      tile_rows=args.tile_rows, workers=args.workers)
+        print(f"Computed {stats['pixels'] / 1e6:.1f} MP in {stats['seconds']:.2f}s "
+              f"({stats['megapixels_per_sec']:.1f} MP/s)")
+
+        # Spot-check against the scalar function
+        month = pd.to_datetime(args.date).month
+        temperature = np.load(temp_path, mmap_mode='r')
+        precipitation = np.load(precip_path, mmap_mode='r')
+        health = np.load(out_path, mmap_mode='r')
+        rng = np.random.default_rng(0)
+        points = rng.integers(0, args.size, (1000, 2))
+        max_error = max(
+            abs(float(health[r, c]) - calculate_forest_health_index(float(temperature[r, c]), float(precipitation[r, c]), month))
+            for r, c in points
+        )
+        print(f"Max difference from scalar function at 1000 points: {max_error:.2e}")
+        del temperature, precipitation, health
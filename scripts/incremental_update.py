@@ -0,0 +1,253 @@
+import os
+import hashlib
+import argparse
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import joblib
+import xgboost
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.metrics import classification_report, accuracy_score
+from load_data import DATA_PATH, load_data_since
+from model_io import load_encoders
+from drift_monitor import build_reference_profile
+
+# Watermark, rolling window and lineage of incremental updates
+TRAINING_STATE_PATH = '../models/training_state.joblib'
+
+XGBOOST_MODEL_PATH = '../models/xgboost_model.joblib'
+DECISION_TREE_MODEL_PATH = '../models/decision_tree_model.joblib'
+ENSEMBLE_MODEL_PATH = '../models/ensemble_model.joblib'
+
+def file_sha256(path):
+    """Returns the SHA-256 of a file, used to chain model lineage."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def prefix_sha256(path, n_bytes):
+    """Returns the SHA-256 of the first n_bytes of a file, used to check the watermark still applies."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        remaining = n_bytes
+        while remaining > 0:
+            block = f.read(min(1 << 20, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+def watermark_matches(state):
+    """
+    True if the dataset still starts with the bytes the watermark was taken
+    over, i.e. rows were only appended since. A regenerated or rewritten file
+    (smaller, or with different leading bytes) does not match.
+    """
+    if 'file_size' not in state:
+        # States written before the check was added cannot be verified
+        return True
+    if os.path.getsize(state['data_path']) < state['file_size']:
+        return False
+    return prefix_sha256(state['data_path'], state['byte_offset']) == state['prefix_sha256']
+
+def rows_sha256(df):
+    """Returns a content hash of a batch of dataset rows."""
+    return hashlib.sha256(pd.util.hash_pandas_object(df, index=False).values.tobytes()).hexdigest()
+
+def encode_features(df, ohe_threat_type):
+    """Builds the feature matrix in the same column layout as the trainers."""
+    encoded_threat_type = ohe_threat_type.transform(df[['Threat Type']])
+    encoded_threat_type_df = pd.DataFrame(encoded_threat_type, columns=ohe_threat_type.get_feature_names_out(['Threat Type']))
+    df = pd.concat([df.drop('Threat Type', axis=1).reset_index(drop=True), encoded_threat_type_df], axis=1)
+    return df.drop(['Threat Name', 'Date', 'Wildlife Affected'], axis=1)
+
+def continue_boosting(model, X, y, num_rounds):
+    """
+    Adds boosting rounds to a fitted XGBClassifier using only the new rows.
+
+    xgboost.train is used instead of XGBClassifier.fit(xgb_model=...) because
+    the sklearn wrapper infers the class count from y, which breaks when a
+    batch of new rows does not contain every threat.
+    """
+    params = model.get_xgb_params()
+    params['num_class'] = model.n_classes_
+    dtrain = xgboost.DMatrix(X, label=y)
+    booster = xgboost.train(params, dtrain, num_boost_round=num_rounds, xgb_model=model.get_booster())
+    model._Booster = booster
+    model.n_estimators = booster.num_boosted_rounds()
+    return model
+
+def refresh_decision_tree(current_dt, X_window, y_window, X_holdout, y_holdout):
+    """
+    Refits a decision tree on the rolling window and keeps it only if it does
+    at least as well as the current tree on the holdout.
+    """
+    if set(np.unique(y_window)) != set(current_dt.classes_):
+        # The window is missing some threats, refitting would change the class layout
+        return current_dt, False
+
+    candidate = DecisionTreeClassifier(max_depth=10, min_samples_split=5, random_state=42)
+    candidate.fit(X_window, y_window)
+
+    if len(y_holdout) == 0:
+        return candidate, True
+
+    if accuracy_score(y_holdout, candidate.predict(X_holdout)) >= accuracy_score(y_holdout, current_dt.predict(X_holdout)):
+        return candidate, True
+    return current_dt, False
+
+def initialize_state(window_size):
+    """Records the current end of the dataset as the watermark for the saved models."""
+    df, byte_offset = load_data_since(0)
+    state = {
+        'data_path': os.path.abspath(DATA_PATH),
+        'byte_offset': byte_offset,
+        'file_size': os.path.getsize(DATA_PATH),
+        'prefix_sha256': prefix_sha256(DATA_PATH, byte_offset),
+        'row_count': len(df),
+        'window': df.tail(window_size).reset_index(drop=True),
+        'pending': df.iloc[0:0],
+        'lineage': [{
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'event': 'baseline',
+            'rows': (0, len(df)),
+            'batch_sha256': rows_sha256(df),
+            'models': {path: file_sha256(path) for path in (XGBOOST_MODEL_PATH, DECISION_TREE_MODEL_PATH, ENSEMBLE_MODEL_PATH)}
+        }]
+    }
+    joblib.dump(state, TRAINING_STATE_PATH)
+    return state
+
+def incremental_update(num_rounds=20, window_size=2000, holdout_size=500, rebaseline=False):
+    """
+    Update the saved models with the rows appended to the dataset since the
+    last training watermark instead of retraining from scratch.
+
+    The XGBoost models (standalone and inside the ensemble) continue boosting
+    from their saved boosters. The decision trees are refit on a bounded window
+    of recent rows and only replaced when they do not lose accuracy. The newest
+    rows of each batch are held out for evaluation and trained on in the next
+    update, so every row is eventually used for training.
+
+    Args:
+        num_rounds (int): Boosting rounds to add per update
+        window_size (int): Number of recent rows kept for refitting decision trees
+        holdout_size (int): Maximum number of newest rows held out for evaluation
+        rebaseline (bool): If the dataset was rewritten rather than appended to,
+            record a new baseline at its current end instead of refusing to update
+
+    Returns:
+        dict: The updated training state
+    """
+    if not os.path.exists(TRAINING_STATE_PATH):
+        state = initialize_state(window_size)
+        print(f"No training watermark found. Recorded baseline at {state['row_count']} rows.")
+        return state
+
+    state = joblib.load(TRAINING_STATE_PATH)
+    if not watermark_matches(state):
+        if not rebaseline:
+            raise ValueError(
+                f"{state['data_path']} no longer starts with the {state['row_count']} rows the watermark was "
+                "recorded over (the file was regenerated or edited). Retrain the models on the new dataset, "
+                "then run with --rebaseline to record a new watermark."
+            )
+        state = initialize_state(window_size)
+        print(f"Dataset was rewritten. Recorded new baseline at {state['row_count']} rows.")
+        return state
+
+    new_rows, byte_offset = load_data_since(state['byte_offset'], state['data_path'])
+    if new_rows.empty:
+        print("No new rows since the last update.")
+        return state
+
+    # Rows held out last time are trained on now, the newest rows become the holdout
+    batch = pd.concat([state['pending'], new_rows], ignore_index=True)
+    n_holdout = min(holdout_size, len(batch) // 5)
+    train_rows = batch.iloc[:len(batch) - n_holdout]
+    holdout_rows = batch.iloc[len(batch) - n_holdout:]
+    window = pd.concat([state['window'], train_rows], ignore_index=True).tail(window_size)
+
+    ohe_threat_type, le_threat_name = load_encoders()
+    X_train = encode_features(train_rows, ohe_threat_type)
+    y_train = le_threat_name.transform(train_rows['Threat Name'])
+    X_holdout = encode_features(holdout_rows, ohe_threat_type)
+    y_holdout = le_threat_name.transform(holdout_rows['Threat Name'])
+    X_window = encode_features(window, ohe_threat_type)
+    y_window = le_threat_name.transform(window['Threat Name'])
+
+    xgb = joblib.load(XGBOOST_MODEL_PATH)
+    dt = joblib.load(DECISION_TREE_MODEL_PATH)
+    ensemble = joblib.load(ENSEMBLE_MODEL_PATH)
+    parent_models = state['lineage'][-1]['models']
+
+    if len(train_rows) > 0:
+        continue_boosting(xgb, X_train, y_train, num_rounds)
+
+        # decision_tree_model.py trains on threat names, the ensemble on encoded labels
+        dt, dt_refreshed = refresh_decision_tree(dt, X_window, window['Threat Name'].values, X_holdout, holdout_rows['Threat Name'].values)
+
+        ensemble_xgb = continue_boosting(ensemble.named_estimators_['xgb'], X_train, y_train, num_rounds)
+        ensemble_dt, ensemble_dt_refreshed = refresh_decision_tree(ensemble.named_estimators_['dt'], X_window, y_window, X_holdout, y_holdout)
+        ensemble.estimators_ = [ensemble_dt, ensemble_xgb]
+        ensemble.named_estimators_['dt'] = ensemble_dt
+        ensemble.named_estimators_['xgb'] = ensemble_xgb
+    else:
+        dt_refreshed = ensemble_dt_refreshed = False
+
+    # Evaluate on the rolling holdout
+    metrics = {}
+    if n_holdout > 0:
+        metrics = {
+            'xgboost_accuracy': accuracy_score(y_holdout, xgb.predict(X_holdout)),
+            'decision_tree_accuracy': accuracy_score(holdout_rows['Threat Name'], dt.predict(X_holdout)),
+            'ensemble_accuracy': accuracy_score(y_holdout, ensemble.predict(X_holdout))
+        }
+        print("XGBoost Holdout Accuracy:", metrics['xgboost_accuracy'])
+        print("Decision Tree Holdout Accuracy:", metrics['decision_tree_accuracy'])
+        print("Ensemble Holdout Accuracy:", metrics['ensemble_accuracy'])
+        labels = np.arange(len(le_threat_name.classes_))
+        print(classification_report(y_holdout, ensemble.predict(X_holdout), labels=labels,
+                                    target_names=le_threat_name.classes_, zero_division=0))
+
+    joblib.dump(xgb, XGBOOST_MODEL_PATH)
+    joblib.dump(dt, DECISION_TREE_MODEL_PATH)
+    joblib.dump(ensemble, ENSEMBLE_MODEL_PATH)
+    # Keep the drift reference in step with the updated ensemble
+    build_reference_profile()
+
+    start_row = state['row_count']
+    state['lineage'].append({
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'event': 'incremental_update',
+        'rows': (start_row, start_row + len(new_rows)),
+        'batch_sha256': rows_sha256(new_rows),
+        'trained_rows': len(train_rows),
+        'holdout_rows': n_holdout,
+        'boosting_rounds': num_rounds,
+        'decision_tree_refreshed': dt_refreshed,
+        'ensemble_decision_tree_refreshed': ensemble_dt_refreshed,
+        'metrics': metrics,
+        'parent_models': parent_models,
+        'models': {path: file_sha256(path) for path in (XGBOOST_MODEL_PATH, DECISION_TREE_MODEL_PATH, ENSEMBLE_MODEL_PATH)}
+    })
+    state['byte_offset'] = byte_offset
+    state['file_size'] = os.path.getsize(state['data_path'])
+    state['prefix_sha256'] = prefix_sha256(state['data_path'], byte_offset)
+    state['row_count'] = start_row + len(new_rows)
+    state['window'] = window.reset_index(drop=True)
+    state['pending'] = holdout_rows.reset_index(drop=True)
+    joblib.dump(state, TRAINING_STATE_PATH)
+
+    print(f"Updated models with {len(new_rows)} new rows (watermark: {state['row_count']} rows).")
+    return state
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update the saved models with rows appended to the dataset.")
+    parser.add_argument('--rebaseline', action='store_true',
+                        help="Record a new watermark if the dataset was rewritten instead of appended to")
+    args = parser.parse_args()
+    incremental_update(rebaseline=args.rebaseline)
@@ -1,12 +1,41 @@
 import pandas as pd
 import os
+import io
+
+DATA_PATH = os.path.join('..', 'data', 'forest_threats_dataset.csv')
 
 def load_data():
-    data_folder = os.path.join('..', 'data')
-    file_path = os.path.join(data_folder, 'forest_threats_dataset.csv')
+    file_path = DATA_PATH
     df = pd.read_csv(file_path, parse_dates=['Date'], date_format='%d %B')
     return df
 
+def load_data_since(byte_offset=0, file_path=DATA_PATH):
+    """
+    Load only the rows appended to the dataset after a byte offset.
+
+    Only complete lines are consumed, so a row that is still being written
+    is left for the next call.
+
+    Args:
+        byte_offset (int): Offset returned by a previous call (0 reads everything)
+        file_path (str): Path to the dataset CSV
+
+    Returns:
+        tuple: (new_rows_df, new_byte_offset)
+    """
+    with open(file_path, 'rb') as f:
+        header = f.readline()
+        start = max(byte_offset, f.tell())
+        f.seek(start)
+        chunk = f.read()
+
+    # Stop at the last complete line
+    end = chunk.rfind(b'\n') + 1
+    chunk = chunk[:end]
+
+    df = pd.read_csv(io.BytesIO(header + chunk), parse_dates=['Date'], date_format='%d %B')
+    return df, start + end
+
 if __name__ == "__main__":
     data = load_data()
     print(data.head())
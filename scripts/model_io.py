@@ -0,0 +1,39 @@
+import joblib
+import pandas as pd
+from sklearn.preprocessing import OneHotEncoder, LabelEncoder
+
+ENCODERS_PATH = '../models/encoders.joblib'
+
+# Categories of the 'Threat Type' column (prophet_model.THREAT_TYPES maps each threat to one)
+THREAT_TYPE_CATEGORIES = ['Human Made', 'Natural']
+
+def load_encoders(with_wildlife=False):
+    """
+    Loads the threat-type one-hot encoder and threat-name label encoder.
+
+    encoders.joblib holds either the (ohe, le_threat_name, le_wildlife) tuple
+    written by ensemble_model.py or the bare LabelEncoder written by
+    xgboost_model.py, depending on which trainer ran last.
+
+    Args:
+        with_wildlife (bool): Also return the wildlife impact encoder, None
+            when the file does not carry one
+
+    Returns:
+        tuple: (ohe_threat_type, le_threat_name), plus le_wildlife when with_wildlife is True
+    """
+    encoders = joblib.load(ENCODERS_PATH)
+    le_wildlife = None
+    if isinstance(encoders, tuple) and len(encoders) >= 2:
+        ohe_threat_type, le_threat_name = encoders[0], encoders[1]
+        if len(encoders) >= 3:
+            le_wildlife = encoders[2]
+    elif isinstance(encoders, LabelEncoder):
+        le_threat_name = encoders
+        ohe_threat_type = OneHotEncoder(sparse_output=False, handle_unknown='ignore')
+        ohe_threat_type.fit(pd.DataFrame({'Threat Type': THREAT_TYPE_CATEGORIES}))
+    else:
+        raise ValueError("Cannot interpret encoder format")
+    if with_wildlife:
+        return ohe_threat_type, le_threat_name, le_wildlife
+    return ohe_threat_type, le_threat_name
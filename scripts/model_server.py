@@ -0,0 +1,425 @@
+import os
+import json
+import time
+import random
+import argparse
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import joblib
+from fast_prophet import FastProphet
+from model_io import load_encoders
+from reinforcement_learning import RLAgent, MITIGATION_STRATEGIES, SEVERITY_CATEGORIES
+from threat_prediction import apply_forecast_variance, select_threat, build_prediction_result, alert_thresholds_met
+
+ENSEMBLE_MODEL_PATH = '../models/ensemble_model.joblib'
+PROPHET_MODELS_PATH = '../models/prophet_models.joblib'
+
+MITIGATION_THREATS = list(MITIGATION_STRATEGIES)
+
+# Per-process state of a serving worker, set by the initializer
+_worker = {}
+
+def pack_ensemble(ensemble_model):
+    """
+    Flatten the soft-voting ensemble into plain node arrays: the decision tree's
+    split features, thresholds, children and normalized leaf distributions, and
+    every XGBoost tree's nodes concatenated with global child indices.
+
+    Returns:
+        tuple: (dict of numpy arrays, dict of scalar metadata)
+    """
+    tree = ensemble_model.named_estimators_['dt'].tree_
+    value = tree.value[:, 0, :]
+    arrays = {
+        'dt_feature': tree.feature.astype(np.int32),
+        'dt_threshold': tree.threshold.astype(np.float64),
+        'dt_left': tree.children_left.astype(np.int32),
+        'dt_right': tree.children_right.astype(np.int32),
+        'dt_value': value / value.sum(axis=1, keepdims=True)
+    }
+
+    booster = ensemble_model.named_estimators_['xgb'].get_booster()
+    model = json.loads(booster.save_raw('json'))
+    trees = model['learner']['gradient_booster']['model']['trees']
+    feature, threshold, left, right, default_left, roots = [], [], [], [], [], []
+    offset = 0
+    for xgb_tree in trees:
+        tree_left = np.array(xgb_tree['left_children'], dtype=np.int32)
+        tree_right = np.array(xgb_tree['right_children'], dtype=np.int32)
+        roots.append(offset)
+        feature.append(np.array(xgb_tree['split_indices'], dtype=np.int32))
+        # Leaves keep their value in split_conditions
+        threshold.append(np.array(xgb_tree['split_conditions'], dtype=np.float32))
+        left.append(np.where(tree_left == -1, -1, tree_left + offset))
+        right.append(np.where(tree_right == -1, -1, tree_right + offset))
+        default_left.append(np.array(xgb_tree['default_left'], dtype=np.uint8))
+        offset += len(tree_left)
+
+    n_classes = int(model['learner']['learner_model_param']['num_class'])
+    arrays.update({
+        'xgb_feature': np.concatenate(feature),
+        'xgb_threshold': np.concatenate(threshold),
+        'xgb_left': np.concatenate(left).astype(np.int32),
+        'xgb_right': np.concatenate(right).astype(np.int32),
+        'xgb_default_left': np.concatenate(default_left),
+        'xgb_roots': np.array(roots, dtype=np.int32),
+        'xgb_tree_class': np.array(model['learner']['gradient_booster']['model']['tree_info'], dtype=np.int32)
+    })
+    metadata = {
+        'n_classes': n_classes,
+        'xgb_base_score': float(model['learner']['learner_model_param']['base_score'])
+    }
+    return arrays, metadata
+
+class SharedArrays:
+    """
+    Numpy arrays laid out in one shared memory block. The creating process
+    owns and unlinks the block; other processes attach by manifest and get
+    read-only views onto the same pages without copying.
+    """
+
+    def __init__(self, shm, manifest, owner):
+        self.shm = shm
+        self.manifest = manifest
+        self.owner = owner
+        self.arrays = {
+            name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+            for name, (dtype, shape, offset) in manifest['arrays'].items()
+        }
+        if not owner:
+            for array in self.arrays.values():
+                array.flags.writeable = False
+
+    @classmethod
+    def create(cls, arrays):
+        layout, size = {}, 0
+        for name, array in arrays.items():
+            size = (size + 63) // 64 * 64  # 64-byte alignment
+            layout[name] = (array.dtype.str, array.shape, size)
+            size += array.nbytes
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        shared = cls(shm, {'name': shm.name, 'arrays': layout}, owner=True)
+        for name, array in arrays.items():
+            shared.arrays[name][...] = array
+        return shared
+
+    @classmethod
+    def attach(cls, manifest):
+        return cls(shared_memory.SharedMemory(name=manifest['name']), manifest, owner=False)
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def close(self):
+        self.arrays = {}
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+class SharedEnsemble:
+    """
+    predict_proba of the soft-voting ensemble evaluated from packed node
+    arrays, so workers need neither the pickled models nor scikit-learn and
+    XGBoost. Comparisons follow each library: the decision tree sends
+    float32 inputs left when <= threshold, XGBoost when < threshold (or the
+    default direction for missing values).
+    """
+
+    def __init__(self, arrays, metadata):
+        self.arrays = arrays
+        self.n_classes = metadata['n_classes']
+        self.base_score = metadata['xgb_base_score']
+        self.tree_class = np.eye(self.n_classes)[arrays['xgb_tree_class']]
+
+    def _decision_tree_proba(self, X):
+        a = self.arrays
+        rows = np.arange(len(X))
+        node = np.zeros(len(X), dtype=np.int64)
+        while True:
+            left = a['dt_left'][node]
+            internal = left != -1
+            if not internal.any():
+                return a['dt_value'][node]
+            go_left = X[rows, a['dt_feature'][node]] <= a['dt_threshold'][node]
+            node = np.where(internal, np.where(go_left, left, a['dt_right'][node]), node)
+
+    def _xgboost_proba(self, X):
+        a = self.arrays
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(a['xgb_roots'], (len(X), len(a['xgb_roots']))).astype(np.int64)
+        while True:
+            left = a['xgb_left'][node]
+            internal = left != -1
+            if not internal.any():
+                break
+            x = X[rows, a['xgb_feature'][node]]
+            go_left = np.where(np.isnan(x), a['xgb_default_left'][node] == 1, x < a['xgb_threshold'][node])
+            node = np.where(internal, np.where(go_left, left, a['xgb_right'][node]), node)
+
+        margin = self.base_score + a['xgb_threshold'][node].astype(np.float64) @ self.tree_class
+        margin -= margin.max(axis=1, keepdims=True)
+        exp = np.exp(margin)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        return (self._decision_tree_proba(X) + self._xgboost_proba(X)) / 2
+
+class SharedOneHot:
+    """The transform/get_feature_names_out subset of the threat type OneHotEncoder used by select_threat."""
+
+    def __init__(self, categories):
+        self.categories = list(categories)
+
+    def transform(self, values):
+        return np.array([[float(value[0] == category) for category in self.categories] for value in values])
+
+    def get_feature_names_out(self):
+        return np.array([f'Threat Type_{category}' for category in self.categories])
+
+class SharedLabels:
+    """The classes_/inverse_transform subset of the threat name LabelEncoder used by select_threat."""
+
+    def __init__(self, classes):
+        self.classes_ = np.array(classes)
+
+    def inverse_transform(self, indices):
+        return self.classes_[np.asarray(indices)]
+
+class QTableOwner(threading.Thread):
+    """
+    Single owner of the RL agent in the serving parent. Workers send
+    severity feedback and mitigation ratings over a queue; this thread applies
+    them in arrival order, republishes the best mitigation per threat to a
+    shared array workers read, and checkpoints every `checkpoint_every` updates.
+    """
+
+    def __init__(self, agent, updates, best_mitigation, checkpoint_every=1000):
+        super().__init__(daemon=True)
+        self.agent = agent
+        self.updates = updates
+        self.best_mitigation = best_mitigation
+        self.checkpoint_every = checkpoint_every
+        self.applied = 0
+        self.publish()
+
+    def publish(self):
+        for i, threat_type in enumerate(MITIGATION_THREATS):
+            best = self.agent.best_mitigations.get(threat_type)
+            learned = best is not None and best[1] > 0
+            self.best_mitigation[i] = MITIGATION_STRATEGIES[threat_type].index(best[0]) if learned else -1
+
+    def checkpoint(self):
+        self.agent.save_model()
+        # save_model appends the whole history to the metrics file, so start a fresh one
+        self.agent.prediction_history = []
+
+    def run(self):
+        while (update := self.updates.get()) is not None:
+            kind, args = update
+            if kind == 'feedback':
+                self.agent.predict_with_feedback(*args)
+            elif kind == 'mitigation':
+                self.agent.evaluate_mitigation(*args, save=False)
+                self.publish()
+            self.applied += 1
+            if self.applied % self.checkpoint_every == 0:
+                self.checkpoint()
+        self.checkpoint()
+
+def _init_worker(manifest, metadata, updates):
+    """Attaches to the shared model arrays; nothing is unpickled from the model files."""
+    start = time.perf_counter()
+    shared = SharedArrays.attach(manifest)
+    _worker.update({
+        'shared': shared,
+        'ensemble_model': SharedEnsemble(shared, metadata['ensemble']),
+        'ohe_threat_type': SharedOneHot(metadata['threat_types']),
+        'le_threat_name': SharedLabels(metadata['threat_names']),
+        'prophet_models': metadata['prophet_models'],
+        'updates': updates,
+        'init_seconds': time.perf_counter() - start
+    })
+
+def _init_copying_worker():
+    """Loads private copies of every artifact, as each worker does without the server (for comparison)."""
+    start = time.perf_counter()
+    agent = RLAgent()
+    agent.load_model()
+    _worker.update({
+        'ensemble_model': joblib.load(ENSEMBLE_MODEL_PATH),
+        'encoders': load_encoders(),
+        'prophet_models': joblib.load(PROPHET_MODELS_PATH),
+        'rl_agent': agent,
+        'init_seconds': time.perf_counter() - start
+    })
+
+def worker_memory():
+    """This worker's memory from /proc: unique (private) and proportional set size in MB."""
+    fields = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'pid': os.getpid(),
+        'uss_mb': (fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)) / 1024,
+        'pss_mb': fields.get('Pss', 0) / 1024,
+        'init_seconds': _worker.get('init_seconds')
+    }
+
+def _report_memory(hold_seconds):
+    # Holding the worker busy spreads the report tasks over distinct workers
+    time.sleep(hold_seconds)
+    return worker_memory()
+
+def _serve(date_str):
+    """predict_threats for one date inside a serving worker."""
+    if len(date_str.split()) == 2:
+        date_str += f" {pd.Timestamp.now().year}"
+    future_date = pd.to_datetime(date_str, format='%d %B %Y')
+
+    temp_model, precip_model, severity_model = _worker['prophet_models']
+    predicted_temp, predicted_precip, predicted_severity, date_seed = apply_forecast_variance(
+        future_date,
+        temp_model.predict([future_date])['yhat'].values[0],
+        precip_model.predict([future_date])['yhat'].values[0],
+        severity_model.predict([future_date])['yhat'].values[0]
+    )
+    predicted_threat_name = select_threat(
+        _worker['ensemble_model'], _worker['ohe_threat_type'], _worker['le_threat_name'],
+        predicted_temp, predicted_precip, predicted_severity, future_date, date_seed
+    )
+
+    # Read the owner's published best mitigation, send the Q-table update back to the owner
+    suggested_action = "No mitigation available."
+    if predicted_threat_name in MITIGATION_STRATEGIES:
+        strategies = MITIGATION_STRATEGIES[predicted_threat_name]
+        best = int(_worker['shared']['best_mitigation'][MITIGATION_THREATS.index(predicted_threat_name)])
+        suggested_action = strategies[best] if best >= 0 else random.choice(strategies)
+    _worker['updates'].put(('feedback', (predicted_threat_name, 25.0, 10.0,
+                                         SEVERITY_CATEGORIES.get(predicted_severity, "Medium"), None)))
+
+    result = build_prediction_result(
+        future_date, predicted_threat_name, predicted_temp, predicted_precip, predicted_severity, suggested_action
+    )
+    result['Alert'] = alert_thresholds_met(result)
+    return result
+
+class ModelServer:
+    """
+    Multi-process predict_threats serving with one copy of the models.
+
+    The parent loads the ensemble, Prophet models, encoders and RL agent once.
+    The ensemble is packed into node arrays in shared memory which workers
+    attach to zero-copy; the fitted Prophet models are reduced to their
+    FastProphet parameters (a few KB) and the encoders to their category
+    lists, passed once at worker start. Workers are spawned and never import
+    scikit-learn, XGBoost or Prophet, so each extra worker costs only the
+    interpreter with numpy and pandas.
+
+    The RL agent stays in the parent with a QTableOwner thread as the only
+    writer; workers read the published best mitigations from shared memory.
+    """
+
+    def __init__(self, workers=None, checkpoint_every=1000):
+        ensemble_model = joblib.load(ENSEMBLE_MODEL_PATH)
+        ohe_threat_type, le_threat_name = load_encoders()
+        temp_model, precip_model, severity_model, _ = joblib.load(PROPHET_MODELS_PATH)
+
+        arrays, ensemble_metadata = pack_ensemble(ensemble_model)
+        arrays['best_mitigation'] = np.full(len(MITIGATION_THREATS), -1, dtype=np.int32)
+        self.shared = SharedArrays.create(arrays)
+        metadata = {
+            'ensemble': ensemble_metadata,
+            'threat_types': list(ohe_threat_type.categories_[0]),
+            'threat_names': list(le_threat_name.classes_),
+            'prophet_models': [FastProphet(temp_model), FastProphet(precip_model), FastProphet(severity_model)]
+        }
+
+        context = multiprocessing.get_context('spawn')
+        self.updates = context.Queue()
+        agent = RLAgent()
+        agent.load_model()
+        self.owner = QTableOwner(agent, self.updates, self.shared['best_mitigation'], checkpoint_every)
+        self.owner.start()
+
+        self.workers = workers or os.cpu_count()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=_init_worker,
+                                        initargs=(self.shared.manifest, metadata, self.updates))
+
+    def predict(self, date_strs, chunksize=16):
+        """predict_threats results for each date, computed across the workers."""
+        return list(self.pool.map(_serve, date_strs, chunksize=chunksize))
+
+    def evaluate_mitigation(self, threat_type, mitigation, effectiveness_score):
+        """Queues mitigation feedback (0-10) for the Q-table owner."""
+        self.updates.put(('mitigation', (threat_type, mitigation, effectiveness_score)))
+
+    def worker_memory(self, hold_seconds=0.5):
+        """Memory and start-up time of each worker."""
+        futures = [self.pool.submit(_report_memory, hold_seconds) for _ in range(self.workers)]
+        return pd.DataFrame([f.result() for f in futures]).drop_duplicates('pid')
+
+    def close(self):
+        self.pool.shutdown()
+        self.updates.put(None)
+        self.owner.join()
+        self.shared.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def copying_worker_memory(workers, hold_seconds=0.5):
+    """Memory and start-up time of workers that each load their own copy of the models."""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_copying_worker) as pool:
+        futures = [pool.submit(_report_memory, hold_seconds) for _ in range(workers)]
+        return pd.DataFrame([f.result() for f in futures]).drop_duplicates('pid')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve predict_threats from workers sharing one copy of the models.")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--days', type=int, default=365, help="Dates to predict for the throughput check")
+    parser.add_argument('--compare', action='store_true', help="Also measure workers that load their own model copies")
+    args = parser.parse_args()
+
+    # Check the shared ensemble against the pickled one
+    ensemble_model = joblib.load(ENSEMBLE_MODEL_PATH)
+    arrays, ensemble_metadata = pack_ensemble(ensemble_model)
+    rng = np.random.default_rng(0)
+    X = np.column_stack([rng.uniform(0, 40, 5000), rng.uniform(0, 500, 5000), rng.integers(1, 11, 5000),
+                         np.eye(2)[rng.integers(0, 2, 5000)]])
+    expected = ensemble_model.predict_proba(pd.DataFrame(X, columns=ensemble_model.feature_names_in_))
+    actual = SharedEnsemble(arrays, ensemble_metadata).predict_proba(X)
+    print(f"Shared ensemble: max |probability difference| {np.abs(actual - expected).max():.1e}, "
+          f"same argmax {np.mean(actual.argmax(axis=1) == expected.argmax(axis=1)):.2%}")
+
+    start = time.perf_counter()
+    with ModelServer(args.workers) as server:
+        memory = server.worker_memory()
+        ready = time.perf_counter() - start
+        dates = [d.strftime('%d %B %Y') for d in pd.date_range(pd.Timestamp.now().normalize(), periods=args.days)]
+        start = time.perf_counter()
+        results = server.predict(dates)
+        elapsed = time.perf_counter() - start
+
+    print(f"Shared-memory server with {args.workers} workers ready in {ready:.1f}s, "
+          f"{len(results)} predictions in {elapsed:.2f}s ({len(results) / elapsed:.0f}/s)")
+    print(f"  per worker: USS {memory['uss_mb'].mean():.0f} MB, PSS {memory['pss_mb'].mean():.0f} MB, "
+          f"init {memory['init_seconds'].mean() * 1000:.1f} ms")
+
+    if args.compare:
+        start = time.perf_counter()
+        memory = copying_worker_memory(args.workers)
+        print(f"Copying workers ready in {time.perf_counter() - start:.1f}s")
+        print(f"  per worker: USS {memory['uss_mb'].mean():.0f} MB, PSS {memory['pss_mb'].mean():.0f} MB, "
+              f"init {memory['init_seconds'].mean() * 1000:.1f} ms")
@@ -0,0 +1,260 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+import joblib
+import xgboost
+from xgboost import XGBClassifier
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.metrics import accuracy_score
+from sklearn.preprocessing import LabelEncoder, OneHotEncoder
+from load_data import DATA_PATH, load_data
+from prophet_model import ALL_THREATS, get_threat_type
+from model_io import THREAT_TYPE_CATEGORIES
+from drift_monitor import build_reference_profile
+
+FEATURE_COLUMNS = ['Temperature (°C)', 'Precipitation (mm)', 'Severity',
+                   'Threat Type_Human Made', 'Threat Type_Natural']
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (nan on Windows without psutil)."""
+    if sys.platform == 'win32':
+        try:
+            import psutil
+        except ImportError:
+            return float('nan')
+        return psutil.Process().memory_info().peak_wset / 2 ** 20
+
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+def encode_chunk(chunk, le_threat_name):
+    """
+    Encode a raw chunk into the trainers' feature layout as float32, without
+    the intermediate one-hot DataFrame and concat copies.
+    """
+    human_made = (chunk['Threat Type'].values == 'Human Made').astype(np.float32)
+    natural = (chunk['Threat Type'].values == 'Natural').astype(np.float32)
+    X = np.column_stack([
+        chunk['Temperature (°C)'].values.astype(np.float32),
+        chunk['Precipitation (mm)'].values.astype(np.float32),
+        chunk['Severity'].values.astype(np.float32),
+        human_made,
+        natural
+    ])
+    return pd.DataFrame(X, columns=FEATURE_COLUMNS), le_threat_name.transform(chunk['Threat Name'])
+
+def csv_chunks(chunk_size, file_path=DATA_PATH):
+    """Raw dataset chunks read from the CSV."""
+    columns = ['Threat Name', 'Temperature (°C)', 'Precipitation (mm)', 'Threat Type', 'Severity']
+    return lambda: pd.read_csv(file_path, usecols=columns, chunksize=chunk_size)
+
+def simulated_chunks(n_rows, chunk_size, seed=42):
+    """
+    Raw chunks of a simulated history: dataset rows resampled with jittered
+    temperature and precipitation. Each chunk is seeded by its position so
+    every pass over the data regenerates identical rows.
+    """
+    base = load_data()
+    base_threats = base['Threat Name'].values
+    base_temp = base['Temperature (°C)'].values.astype(np.float32)
+    base_precip = base['Precipitation (mm)'].values.astype(np.float32)
+    base_severity = base['Severity'].values.astype(np.float32)
+    threat_types = np.array([get_threat_type(t) for t in base_threats])
+
+    def generate():
+        for chunk_index, start in enumerate(range(0, n_rows, chunk_size)):
+            rng = np.random.default_rng((seed, chunk_index))
+            rows = rng.integers(0, len(base), min(chunk_size, n_rows - start))
+            yield pd.DataFrame({
+                'Threat Name': base_threats[rows],
+                'Temperature (°C)': base_temp[rows] + rng.normal(0, 1.5, len(rows)).astype(np.float32),
+                'Precipitation (mm)': np.maximum(0, base_precip[rows] + rng.normal(0, 10, len(rows)).astype(np.float32)),
+                'Threat Type': threat_types[rows],
+                'Severity': base_severity[rows]
+            })
+    return generate
+
+class ChunkIterator(xgboost.DataIter):
+    """
+    Feeds encoded chunks to XGBoost's external-memory DMatrix. Every fifth
+    row (by global position) is held out and never reaches XGBoost. With
+    row_stride > 1 only every row_stride-th training row is used.
+    """
+
+    def __init__(self, chunk_source, le_threat_name, cache_dir, row_stride=1):
+        self.chunk_source = chunk_source
+        self.le_threat_name = le_threat_name
+        self.row_stride = row_stride
+        self.chunks = None
+        self.rows_seen = 0
+        super().__init__(cache_prefix=os.path.join(cache_dir, 'xgb_cache'))
+
+    def next(self, input_data):
+        if self.chunks is None:
+            self.chunks = iter(self.chunk_source())
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            return 0
+        X, y = encode_chunk(chunk, self.le_threat_name)
+        positions = np.arange(self.rows_seen, self.rows_seen + len(y))
+        train_mask = (positions % 5 != 0) & (positions % (5 * self.row_stride) < 5)
+        self.rows_seen += len(y)
+        input_data(data=X[train_mask], label=y[train_mask])
+        return 1
+
+    def reset(self):
+        self.chunks = None
+        self.rows_seen = 0
+
+class Reservoir:
+    """
+    Fixed-size uniform sample over a stream (Algorithm R), so memory stays
+    bounded no matter how many rows pass through and the threat mix of the
+    sample follows the streamed data.
+    """
+
+    def __init__(self, size, n_features, seed=42):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.X = np.zeros((size, n_features), dtype=np.float32)
+        self.y = np.zeros(size, dtype=np.int64)
+        self.filled = 0
+        self.seen = 0
+
+    def add(self, X, y):
+        seen_before = self.seen
+        self.seen += len(y)
+
+        # Fill free slots first
+        n_fill = min(self.size - self.filled, len(y))
+        self.X[self.filled:self.filled + n_fill] = X[:n_fill]
+        self.y[self.filled:self.filled + n_fill] = y[:n_fill]
+        self.filled += n_fill
+
+        # Then replace with probability size / items seen
+        if len(y) > n_fill:
+            positions = seen_before + n_fill + np.arange(len(y) - n_fill)
+            slots = (self.rng.random(len(positions)) * (positions + 1)).astype(np.int64)
+            replaced = np.flatnonzero(slots < self.size)
+            # When a slot is drawn twice in a batch the later row wins, as in the sequential algorithm
+            _, last = np.unique(slots[replaced][::-1], return_index=True)
+            replaced = replaced[len(replaced) - 1 - last]
+            self.X[slots[replaced]] = X[n_fill + replaced]
+            self.y[slots[replaced]] = y[n_fill + replaced]
+
+    def sample(self):
+        return pd.DataFrame(self.X[:self.filled], columns=FEATURE_COLUMNS), self.y[:self.filled]
+
+def train_out_of_core(chunk_source, chunk_size=1_000_000, num_rounds=100, sample_size=600_000,
+                      holdout_size=200_000, xgb_row_stride=1, save=True):
+    """
+    Train XGBoost and the decision tree without loading the dataset into memory.
+
+    XGBoost trains from an external-memory DMatrix fed chunk by chunk. The
+    decision tree trains on a uniform reservoir sample gathered while
+    streaming, so its class priors match the streamed data. A bounded
+    reservoir of held-out rows gives the evaluation set.
+
+    The data pages live in XGBoost's on-disk cache, but XGBoost still keeps
+    prediction and gradient buffers of rows x 12 classes in memory, so on very
+    large histories xgb_row_stride can thin the rows XGBoost sees.
+
+    Args:
+        chunk_source (callable): Returns an iterable of raw dataset chunks (called once per pass)
+        chunk_size (int): Rows per chunk (used for reporting)
+        num_rounds (int): XGBoost boosting rounds
+        sample_size (int): Decision tree reservoir size
+        holdout_size (int): Evaluation reservoir size
+        xgb_row_stride (int): Train XGBoost on one in every xgb_row_stride training rows
+        save (bool): Save the models with the trainers' file names
+
+    Returns:
+        dict: Row count, accuracies, seconds and peak RSS in MB
+    """
+    le_threat_name = LabelEncoder()
+    le_threat_name.fit(ALL_THREATS)
+    n_classes = len(le_threat_name.classes_)
+
+    # One streaming pass for the decision tree sample and the evaluation holdout
+    start = time.perf_counter()
+    train_sample = Reservoir(sample_size, len(FEATURE_COLUMNS))
+    holdout = Reservoir(holdout_size, len(FEATURE_COLUMNS), seed=7)
+    n_rows = 0
+    for chunk in chunk_source():
+        X, y = encode_chunk(chunk, le_threat_name)
+        holdout_mask = (np.arange(n_rows, n_rows + len(y)) % 5) == 0
+        n_rows += len(y)
+        train_sample.add(X.values[~holdout_mask], y[~holdout_mask])
+        holdout.add(X.values[holdout_mask], y[holdout_mask])
+
+    X_sample, y_sample = train_sample.sample()
+    X_holdout, y_holdout = holdout.sample()
+
+    dt = DecisionTreeClassifier(max_depth=10, min_samples_split=5, random_state=42)
+    dt.fit(X_sample, le_threat_name.inverse_transform(y_sample))
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        dtrain = xgboost.DMatrix(ChunkIterator(chunk_source, le_threat_name, cache_dir, xgb_row_stride))
+        params = {'objective': 'multi:softprob', 'num_class': n_classes, 'learning_rate': 0.1,
+                  'max_depth': 5, 'tree_method': 'hist', 'seed': 42}
+        booster = xgboost.train(params, dtrain, num_boost_round=num_rounds)
+        del dtrain
+
+    # Wrap the booster so it is used like the XGBClassifier saved by xgboost_model.py
+    xgb = XGBClassifier()
+    xgb.load_model(bytearray(booster.save_raw('json')))
+    elapsed = time.perf_counter() - start
+
+    stats = {
+        'rows': n_rows,
+        'chunk_size': chunk_size,
+        'decision_tree_sample_rows': len(y_sample),
+        'xgboost_accuracy': accuracy_score(y_holdout, xgb.predict(X_holdout)),
+        'decision_tree_accuracy': accuracy_score(le_threat_name.inverse_transform(y_holdout), dt.predict(X_holdout)),
+        'seconds': elapsed,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+    if save:
+        # Same encoders tuple as ensemble_model.py, so predict_threats and the batch forecasts keep working
+        ohe_threat_type = OneHotEncoder(sparse_output=False, handle_unknown='ignore')
+        ohe_threat_type.fit(pd.DataFrame({'Threat Type': THREAT_TYPE_CATEGORIES}))
+        le_wildlife = LabelEncoder()
+        le_wildlife.fit(['Very Low', 'Low', 'Medium', 'High', 'Severe'])
+        joblib.dump(xgb, '../models/xgboost_model.joblib')
+        joblib.dump((ohe_threat_type, le_threat_name, le_wildlife), '../models/encoders.joblib')
+        joblib.dump(dt, '../models/decision_tree_model.joblib')
+        # The reference is keyed to the saved encoders' threat names; the
+        # reservoir sample stands in for the dataset, which may not fit in memory
+        build_reference_profile(X_sample)
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train XGBoost and the decision tree out of core.")
+    parser.add_argument('--simulate', type=int, default=None,
+                        help="Train on a simulated history of this many rows instead of the dataset (models are not saved)")
+    parser.add_argument('--chunk-size', type=int, default=1_000_000)
+    parser.add_argument('--rounds', type=int, default=100)
+    parser.add_argument('--sample-size', type=int, default=600_000, help="Rows in the decision tree's reservoir sample")
+    parser.add_argument('--xgb-row-stride', type=int, default=1,
+                        help="Train XGBoost on one in every N training rows to bound its gradient buffers")
+    args = parser.parse_args()
+
+    if args.simulate:
+        source = simulated_chunks(args.simulate, args.chunk_size)
+    else:
+        source = csv_chunks(args.chunk_size)
+
+    stats = train_out_of_core(source, args.chunk_size, args.rounds, args.sample_size,
+                              xgb_row_stride=args.xgb_row_stride, save=not args.simulate)
+    print(f"Trained on {stats['rows']:,} rows in {stats['seconds']:.1f}s "
+          f"(decision tree sample: {stats['decision_tree_sample_rows']:,} rows)")
+    print("XGBoost Accuracy:", stats['xgboost_accuracy'])
+    print("Decision Tree Accuracy:", stats['decision_tree_accuracy'])
+    print(f"Peak RSS: {stats['peak_rss_mb']:.0f} MB")
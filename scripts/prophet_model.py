@@ -1,3 +1,5 @@
+from model_io import load_encoders
+
 def predict_threat(threat_type, date_str):
     """
     Predict environmental conditions and severity for a specific threat type on a future date.
@@ -16,7 +18,8 @@ def predict_threat(threat_type, date_str):
 
     # Load models
     temp_model, precip_model, severity_model, wildlife_model = joblib.load('../models/prophet_models.joblib')
-    ohe_threat_type, le_threat_name, le_wildlife = joblib.load('../models/encoders.joblib')
+    # le_wildlife is None unless ensemble_model.py wrote the encoders
+    ohe_threat_type, le_threat_name, le_wildlife = load_encoders(with_wildlife=True)
 
     # Handle date formatting
     if len(date_str.split()) == 2:
@@ -47,37 +50,133 @@ def predict_threat(threat_type, date_str):
     threat_type_array = ohe_threat_type.transform([[threat_type_encoded]])
     
     # Wildlife impact prediction
-    wildlife_input = np.hstack([[predicted_temp, predicted_precip, predicted_severity], threat_type_array])
-    try:
-        wildlife_encoded = wildlife_model.predict(wildlife_input)[0]
-        wildlife_impact = le_wildlife.inverse_transform([wildlife_encoded])[0]
-    except:
-        # Fallback based on severity
-        wildlife_mapping = {
-            1: "Very Low", 2: "Very Low",
-            3: "Low", 4: "Low",
-            5: "Medium", 6: "Medium",
-            7: "High", 8: "High",
-            9: "Severe", 10: "Severe"
-        }
-        wildlife_impact = wildlife_mapping.get(predicted_severity, "Medium")
+    wildlife_input = np.hstack([[[predicted_temp, predicted_precip, predicted_severity]], threat_type_array])
+    # Fallback based on severity
+    wildlife_impact = WILDLIFE_MAPPING.get(predicted_severity, "Medium")
+    if le_wildlife is not None:
+        try:
+            wildlife_encoded = wildlife_model.predict(wildlife_input)[0]
+            wildlife_impact = le_wildlife.inverse_transform([wildlife_encoded])[0]
+        except ValueError:
+            # The wildlife model's features or labels do not match the saved encoders
+            pass
 
     return predicted_severity, predicted_temp, predicted_precip, wildlife_impact
 
+THREAT_TYPES = {
+    'Deforestation': 'Human Made',
+    'Drought': 'Natural',
+    'Disease': 'Natural',
+    'Fire': 'Natural',
+    'Flood': 'Natural',
+    'Landslide': 'Natural',
+    'Lightning': 'Natural',
+    'Overgrazing': 'Human Made',
+    'Poaching': 'Human Made',
+    'Pollution': 'Human Made',
+    'Storm': 'Natural',
+    'Earthquake': 'Natural'
+}
+
+ALL_THREATS = list(THREAT_TYPES)
+
+WILDLIFE_MAPPING = {
+    1: "Very Low", 2: "Very Low",
+    3: "Low", 4: "Low",
+    5: "Medium", 6: "Medium",
+    7: "High", 8: "High",
+    9: "Severe", 10: "Severe"
+}
+
 def get_threat_type(threat_name):
     """Helper function to map threat names to their types"""
-    threat_types = {
-        'Deforestation': 'Human Made',
-        'Drought': 'Natural',
-        'Disease': 'Natural',
-        'Fire': 'Natural',
-        'Flood': 'Natural',
-        'Landslide': 'Natural',
-        'Lightning': 'Natural',
-        'Overgrazing': 'Human Made',
-        'Poaching': 'Human Made',
-        'Pollution': 'Human Made',
-        'Storm': 'Natural',
-        'Earthquake': 'Natural'
-    }
-    return threat_types.get(threat_name, 'Unknown')
\ No newline at end of file
+    return THREAT_TYPES.get(threat_name, 'Unknown')
+
+def parse_future_dates(date_strs):
+    """
+    Parse "DD Month" or "DD Month YYYY" strings into a DatetimeIndex.
+    Dates without a year are placed in the current year.
+    """
+    import pandas as pd
+    from datetime import datetime
+
+    current_year = datetime.now().year
+    date_strs = [d if len(d.split()) != 2 else f"{d} {current_year}" for d in date_strs]
+    return pd.DatetimeIndex(pd.to_datetime(date_strs, format='%d %B %Y'))
+
+def normalize_severity(raw_severity):
+    """Vectorized form of the severity normalization in predict_threat."""
+    import numpy as np
+
+    severity = np.clip(np.abs(np.round(raw_severity)) % 10, 1, 10).astype(int)
+    return severity
+
+def predict_threat_matrix(date_strs, threats=None, fast=False):
+    """
+    Predict environmental conditions, severity and wildlife impact for every
+    threat on every date in one batched pass.
+
+    Each Prophet model runs once over the whole date vector and the wildlife
+    model runs once over the stacked (dates x threats) feature matrix, so a
+    full daily risk matrix costs about as much as one predict_threat call.
+
+    Args:
+        date_strs (list): Date strings in format "DD Month" or "DD Month YYYY"
+        threats (list, optional): Threat names to include (defaults to all 12)
+        fast (bool): Evaluate the Prophet models with FastProphet (yhat only, no uncertainty sampling)
+
+    Returns:
+        pd.DataFrame: Indexed by (Date, Threat) with columns 'Predicted Severity',
+            'Predicted Temperature', 'Predicted Precipitation' and 'Wildlife Impact'.
+            Use .unstack() on a column to get a dates x threats table.
+    """
+    import numpy as np
+    import pandas as pd
+    import joblib
+
+    # Load models
+    temp_model, precip_model, severity_model, wildlife_model = joblib.load('../models/prophet_models.joblib')
+    # le_wildlife is None unless ensemble_model.py wrote the encoders
+    ohe_threat_type, le_threat_name, le_wildlife = load_encoders(with_wildlife=True)
+
+    threats = ALL_THREATS if threats is None else list(threats)
+    future_dates = parse_future_dates(date_strs)
+    future_df = pd.DataFrame({'ds': future_dates})
+
+    if fast:
+        from fast_prophet import FastProphet
+        temp_model, precip_model, severity_model = FastProphet(temp_model), FastProphet(precip_model), FastProphet(severity_model)
+        future_df = future_dates
+
+    # One Prophet pass per model for the whole date vector
+    predicted_temp = temp_model.predict(future_df)['yhat'].values
+    predicted_precip = precip_model.predict(future_df)['yhat'].values
+    predicted_severity = normalize_severity(severity_model.predict(future_df)['yhat'].values)
+
+    # Precomputed threat-type one-hot rows, one per threat
+    threat_type_lookup = ohe_threat_type.transform(
+        pd.DataFrame({'Threat Type': [get_threat_type(t) for t in threats]})
+    )
+
+    # Stack (dates x threats) rows: date-level values repeat, one-hot rows tile
+    n_dates, n_threats = len(future_dates), len(threats)
+    wildlife_input = np.hstack([
+        np.repeat(np.column_stack([predicted_temp, predicted_precip, predicted_severity]), n_threats, axis=0),
+        np.tile(threat_type_lookup, (n_dates, 1))
+    ])
+    stacked_severity = np.repeat(predicted_severity, n_threats)
+
+    if le_wildlife is not None and getattr(wildlife_model, 'n_features_in_', wildlife_input.shape[1]) == wildlife_input.shape[1]:
+        wildlife_encoded = wildlife_model.predict(wildlife_input)
+        wildlife_impact = le_wildlife.inverse_transform(wildlife_encoded)
+    else:
+        # Fallback based on severity
+        wildlife_impact = np.array([WILDLIFE_MAPPING.get(s, "Medium") for s in stacked_severity])
+
+    index = pd.MultiIndex.from_product([future_dates, threats], names=['Date', 'Threat'])
+    return pd.DataFrame({
+        'Predicted Severity': stacked_severity,
+        'Predicted Temperature': np.repeat(predicted_temp, n_threats),
+        'Predicted Precipitation': np.repeat(predicted_precip, n_threats),
+        'Wildlife Impact': wildlife_impact
+    }, index=index)
\ No newline at end of file
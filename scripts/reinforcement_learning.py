@@ -1,5 +1,6 @@
 import numpy as np
 import random
+import heapq
 import joblib
 from collections import defaultdict
 import sys
@@ -12,8 +13,15 @@ sys.path.append('D:/vscode/Forest Threat Detection/scripts')  # Keep original pa
 RL_MODEL_PATH = '../models/rl_agent_model.joblib'
 RL_METRICS_PATH = '../metrics/rl_performance.csv'
 
+# Capacity of the severity Q-table (states); rarely used states are evicted beyond it
+RL_MAX_STATES = 50000
+# Coarser buckets evicted states are merged into
+COARSE_TEMP_BUCKET = 20
+COARSE_PRECIP_BUCKET = 100
+
 class RLAgent:
-    def __init__(self, learning_rate=0.1, discount_factor=0.9, exploration_rate=0.1):
+    def __init__(self, learning_rate=0.1, discount_factor=0.9, exploration_rate=0.1,
+                 max_states=RL_MAX_STATES, merge_evicted=True, evict_fraction=0.1):
         self.learning_rate = learning_rate
         self.discount_factor = discount_factor
         self.exploration_rate = exploration_rate
@@ -22,6 +30,16 @@ class RLAgent:
         self.accuracy = 0.0  # Track accuracy metric
         self.total_predictions = 0
         self.correct_predictions = 0
+        self.best_mitigations = {}  # threat_type -> (strategy, effectiveness), kept current on updates
+        
+        # Bounded severity state space: visit counts and recency per state for eviction
+        self.max_states = max_states
+        self.merge_evicted = merge_evicted
+        self.evict_fraction = evict_fraction
+        self.state_visits = {}  # state -> [visits, last_step]
+        self.step = 0
+        self.coarse_q_table = {}  # coarse state -> (q_values, weight), filled by merged evictions
+        self.evicted_states = 0
 
     def get_state(self, threat_type, temperature, precipitation):
         """Encodes the state based on threat and environmental conditions."""
@@ -30,6 +48,94 @@ class RLAgent:
         precip_bucket = round(precipitation / 10) * 10  # Round to nearest 10mm
         return (threat_type, temp_bucket, precip_bucket)
 
+    def coarse_state(self, state):
+        """The coarser bucket a state is merged into when evicted."""
+        threat_type, temp_bucket, precip_bucket = state
+        return (threat_type,
+                round(temp_bucket / COARSE_TEMP_BUCKET) * COARSE_TEMP_BUCKET,
+                round(precip_bucket / COARSE_PRECIP_BUCKET) * COARSE_PRECIP_BUCKET)
+
+    def severity_q_values(self, state):
+        """Q-values of a state, falling back to its coarse bucket if the state was evicted or is new."""
+        q_values = self.q_table.get(state)
+        if q_values:
+            return q_values
+        coarse = self.coarse_q_table.get(self.coarse_state(state))
+        return coarse[0] if coarse else {}
+
+    def touch_state(self, state):
+        """Records a visit to a severity state, evicting rarely used states beyond capacity."""
+        self.step += 1
+        visits = self.state_visits.get(state)
+        if visits is not None:
+            visits[0] += 1
+            visits[1] = self.step
+            return
+        
+        # New state: warm-start from its coarse bucket if one exists
+        if state not in self.q_table:
+            coarse = self.coarse_q_table.get(self.coarse_state(state))
+            if coarse:
+                self.q_table[state] = defaultdict(float, coarse[0])
+        self.state_visits[state] = [1, self.step]
+        if self.max_states and len(self.state_visits) > self.max_states:
+            self.evict_states(keep=state)
+
+    def evict_states(self, keep=None):
+        """
+        Evicts the least-visited states (oldest first among equal counts) down
+        to (1 - evict_fraction) of capacity, merging their Q-values into coarse
+        buckets when merge_evicted is set. Visit counts of the remaining states
+        are halved so old popularity fades.
+        """
+        target = int(self.max_states * (1 - self.evict_fraction))
+        n_evict = len(self.state_visits) - target
+        if n_evict <= 0:
+            return
+        candidates = ((visits[0], visits[1], state) for state, visits in self.state_visits.items() if state != keep)
+        for visits, _, state in heapq.nsmallest(n_evict, candidates, key=lambda c: (c[0], c[1])):
+            q_values = self.q_table.pop(state, None)
+            del self.state_visits[state]
+            if self.merge_evicted and q_values:
+                self.merge_into_coarse(state, q_values, visits)
+        self.evicted_states += n_evict
+        
+        for visits in self.state_visits.values():
+            visits[0] = (visits[0] + 1) // 2
+        
+        # Coarse buckets are bounded as well: drop the lightest beyond a tenth of capacity
+        max_coarse = max(1, self.max_states // 10)
+        if len(self.coarse_q_table) > max_coarse:
+            n_drop = len(self.coarse_q_table) - int(max_coarse * (1 - self.evict_fraction))
+            lightest = heapq.nsmallest(n_drop, self.coarse_q_table.items(), key=lambda item: item[1][1])
+            for coarse_state, _ in lightest:
+                del self.coarse_q_table[coarse_state]
+
+    def merge_into_coarse(self, state, q_values, weight):
+        """Folds a state's Q-values into its coarse bucket as a visit-weighted average."""
+        coarse_state = self.coarse_state(state)
+        coarse_q, coarse_weight = self.coarse_q_table.get(coarse_state, ({}, 0))
+        merged = {}
+        for severity in set(coarse_q) | set(q_values):
+            if severity not in coarse_q:
+                merged[severity] = q_values[severity]
+            elif severity not in q_values:
+                merged[severity] = coarse_q[severity]
+            else:
+                merged[severity] = (coarse_q[severity] * coarse_weight + q_values[severity] * weight) / (coarse_weight + weight)
+        self.coarse_q_table[coarse_state] = (merged, coarse_weight + weight)
+
+    def get_occupancy(self):
+        """Reports how full the bounded severity Q-table is."""
+        return {
+            'states': len(self.state_visits),
+            'max_states': self.max_states,
+            'occupancy': len(self.state_visits) / self.max_states if self.max_states else None,
+            'coarse_states': len(self.coarse_q_table),
+            'mitigation_entries': sum(1 for key in self.q_table if isinstance(key, tuple) and len(key) == 2),
+            'evicted_states': self.evicted_states
+        }
+
     def choose_severity(self, state, possible_severities, confidence=None):
         """Selects severity prediction based on Q-values or exploration with confidence weighting."""
         # Use confidence to adjust exploration rate if provided
@@ -41,7 +147,7 @@ class RLAgent:
         if random.uniform(0, 1) < effective_exploration:
             return random.choice(possible_severities)
         else:
-            q_values = self.q_table[state]
+            q_values = self.severity_q_values(state)
             if not q_values:  # If no Q-values yet
                 return random.choice(possible_severities)
             return max(q_values, key=q_values.get)
@@ -49,18 +155,10 @@ class RLAgent:
     def choose_mitigation(self, threat_type):
         """Selects the most effective mitigation strategy for a given threat."""
         if threat_type in MITIGATION_STRATEGIES:
-            # Get the Q-values for this threat type's mitigations
-            mitigation_values = defaultdict(float)
-            
-            # Check if we have any learned values for the mitigations
-            for strategy in MITIGATION_STRATEGIES[threat_type]:
-                # Use threat_type as part of the state for mitigation strategies
-                mitigation_state = (threat_type, strategy)
-                mitigation_values[strategy] = self.q_table.get(mitigation_state, {}).get('effectiveness', 0.0)
-            
-            # If we have learned values, use them
-            if any(mitigation_values.values()):
-                return max(mitigation_values.items(), key=lambda x: x[1])[0]
+            # If we have learned values, use the best one from the index
+            best = self.best_mitigations.get(threat_type)
+            if best is not None and best[1] > 0:
+                return best[0]
             
             # Otherwise, random selection
             return random.choice(MITIGATION_STRATEGIES[threat_type])
@@ -68,7 +166,8 @@ class RLAgent:
 
     def update_q_value(self, state, severity, reward, next_state):
         """Updates the Q-value for severity prediction."""
-        future_best = max(self.q_table[next_state].values(), default=0.0)
+        future_best = max(self.severity_q_values(next_state).values(), default=0.0)
+        self.touch_state(state)
         old_value = self.q_table[state][severity]
         new_value = old_value + self.learning_rate * (reward + self.discount_factor * future_best - old_value)
         self.q_table[state][severity] = new_value
@@ -84,6 +183,18 @@ class RLAgent:
             self.q_table[mitigation_state] = {}
         
         self.q_table[mitigation_state]['effectiveness'] = new_value
+        self.refresh_best_mitigation(threat_type)
+
+    def refresh_best_mitigation(self, threat_type):
+        """Recomputes the best learned mitigation for one threat in the index."""
+        best = None
+        for strategy in MITIGATION_STRATEGIES.get(threat_type, []):
+            # Use threat_type as part of the state for mitigation strategies
+            value = self.q_table.get((threat_type, strategy), {}).get('effectiveness', 0.0)
+            if best is None or value > best[1]:
+                best = (strategy, value)
+        if best is not None:
+            self.best_mitigations[threat_type] = best
 
     def predict_with_feedback(self, threat_type, temperature, precipitation, actual_severity, confidence=None):
         """Runs prediction and improves accuracy dynamically with feedback."""
@@ -142,7 +253,11 @@ class RLAgent:
             'exploration_rate': self.exploration_rate,
             'total_predictions': self.total_predictions,
             'correct_predictions': self.correct_predictions,
-            'accuracy': self.accuracy
+            'accuracy': self.accuracy,
+            'state_visits': {str(k): v for k, v in self.state_visits.items()},
+            'step': self.step,
+            'coarse_q_table': {str(k): v for k, v in self.coarse_q_table.items()},
+            'evicted_states': self.evicted_states
         }, RL_MODEL_PATH)
         
         # Save metrics if we have prediction history
@@ -188,6 +303,22 @@ class RLAgent:
                 self.correct_predictions = saved_data.get('correct_predictions', 0)
                 self.accuracy = saved_data.get('accuracy', 0.0)
                 
+                # Restore visit counts; states saved before tracking count as one old visit
+                saved_visits = {eval(k): v for k, v in saved_data.get('state_visits', {}).items()}
+                self.state_visits = {
+                    key: list(saved_visits.get(key, [1, 0]))
+                    for key in self.q_table if isinstance(key, tuple) and len(key) == 3
+                }
+                self.step = saved_data.get('step', 0)
+                self.coarse_q_table = {eval(k): v for k, v in saved_data.get('coarse_q_table', {}).items()}
+                self.evicted_states = saved_data.get('evicted_states', 0)
+                if self.max_states and len(self.state_visits) > self.max_states:
+                    self.evict_states()
+                
+                # Rebuild the best-mitigation index from the restored Q-table
+                for threat_type in MITIGATION_STRATEGIES:
+                    self.refresh_best_mitigation(threat_type)
+                
                 return True
             except Exception as e:
                 print(f"Error loading RL model: {e}")
@@ -200,17 +331,19 @@ class RLAgent:
             'accuracy': self.accuracy,
             'total_predictions': self.total_predictions,
             'learning_rate': self.learning_rate,
-            'exploration_rate': self.exploration_rate
+            'exploration_rate': self.exploration_rate,
+            'occupancy': self.get_occupancy()
         }
 
-    def evaluate_mitigation(self, threat_type, mitigation, effectiveness_score):
+    def evaluate_mitigation(self, threat_type, mitigation, effectiveness_score, save=True):
         """Allow feedback on mitigation effectiveness (0-10 scale)."""
         # Normalize score to 0-1 range
         normalized_score = effectiveness_score / 10.0
         self.update_mitigation_q_value(threat_type, mitigation, normalized_score)
         
         # Save after each evaluation to preserve feedback
-        self.save_model()
+        if save:
+            self.save_model()
 
 # Mitigation strategies with all threats included
 MITIGATION_STRATEGIES = {
@@ -289,10 +422,32 @@ MITIGATION_STRATEGIES = {
     ]
 }
 
-# Create a global instance of the RL agent to maintain state between calls
-_rl_agent = RLAgent()
-# Try to load existing model
-_rl_agent.load_model()
+# Map numeric severity (1-10) to the categories the agent predicts
+SEVERITY_CATEGORIES = {
+    1: "Low",
+    2: "Low",
+    3: "Low",
+    4: "Medium",
+    5: "Medium",
+    6: "Medium",
+    7: "High",
+    8: "High",
+    9: "Severe",
+    10: "Severe"
+}
+
+# Global instance of the RL agent to maintain state between calls, loaded on first use
+# so processes that only import this module do not each load a copy of the Q-table
+_rl_agent = None
+
+def get_rl_agent():
+    """Returns the global RL agent, creating it and loading the saved model on first use."""
+    global _rl_agent
+    if _rl_agent is None:
+        _rl_agent = RLAgent()
+        # Try to load existing model
+        _rl_agent.load_model()
+    return _rl_agent
 
 def reinforce_predictions(threat_type, severity_value, temperature=None, precipitation=None, confidence=None):
     """
@@ -309,34 +464,19 @@ def reinforce_predictions(threat_type, severity_value, temperature=None, precipi
     Returns:
         str: A recommended mitigation strategy
     """
-    global _rl_agent
-    
-    # Map numeric severity to categorical
-    severity_map = {
-        1: "Low",
-        2: "Low",
-        3: "Low",
-        4: "Medium",
-        5: "Medium",
-        6: "Medium",
-        7: "High",
-        8: "High",
-        9: "Severe",
-        10: "Severe"
-    }
-    
     # Get the categorical severity value (or default to "Medium" if not found)
-    actual_severity = severity_map.get(severity_value, "Medium")
+    actual_severity = SEVERITY_CATEGORIES.get(severity_value, "Medium")
     
     # Use provided values if available, otherwise use defaults
     temp = temperature if temperature is not None else 25.0
     precip = precipitation if precipitation is not None else 10.0
     
     # Use the global RL agent to get a mitigation strategy
-    _, mitigation, _ = _rl_agent.predict_with_feedback(threat_type, temp, precip, actual_severity, confidence)
+    agent = get_rl_agent()
+    _, mitigation, _ = agent.predict_with_feedback(threat_type, temp, precip, actual_severity, confidence)
     
     # Save the model to preserve learning
-    _rl_agent.save_model()
+    agent.save_model()
     
     return mitigation
 
@@ -348,8 +488,6 @@ def analyze_rl_performance():
     Returns:
         dict: Performance metrics
     """
-    global _rl_agent
-    
     # Load metrics file if it exists
     if os.path.exists(RL_METRICS_PATH):
         metrics_df = pd.read_csv(RL_METRICS_PATH)
@@ -369,7 +507,7 @@ def analyze_rl_performance():
             metrics_df['rolling_accuracy'] = metrics_df['is_correct'].rolling(window=10).mean() * 100
         
         # Get current metrics from the agent
-        agent_metrics = _rl_agent.get_performance_metrics()
+        agent_metrics = get_rl_agent().get_performance_metrics()
         
         performance_data = {
             'overall_accuracy': overall_accuracy,
@@ -382,7 +520,7 @@ def analyze_rl_performance():
         return performance_data
     
     # If no metrics file exists, return current agent metrics
-    return {'agent_metrics': _rl_agent.get_performance_metrics()}
+    return {'agent_metrics': get_rl_agent().get_performance_metrics()}
 
 def evaluate_mitigation_feedback(threat_type, mitigation, effectiveness_score):
     """
@@ -396,12 +534,81 @@ def evaluate_mitigation_feedback(threat_type, mitigation, effectiveness_score):
     Returns:
         bool: Success status
     """
-    global _rl_agent
-    _rl_agent.evaluate_mitigation(threat_type, mitigation, effectiveness_score)
+    get_rl_agent().evaluate_mitigation(threat_type, mitigation, effectiveness_score)
     return True
 
+def ingest_mitigation_feedback(file_path, agent=None):
+    """
+    Applies a file of mitigation feedback in bulk and checkpoints once.
+    
+    The file is a CSV with columns threat_type, mitigation and
+    effectiveness_score (0-10). The mitigation may be the strategy text or its
+    1-based number in MITIGATION_STRATEGIES. Rows are validated up front, valid
+    ones are applied in file order in memory, and the model is saved once at
+    the end instead of once per row.
+    
+    Args:
+        file_path (str): Path to the feedback CSV
+        agent (RLAgent, optional): Agent to update (defaults to the global agent)
+    
+    Returns:
+        dict: Counts of applied and rejected rows, and the rejected rows with reasons
+    """
+    agent = agent or get_rl_agent()
+    
+    feedback = pd.read_csv(file_path, dtype={'threat_type': str, 'mitigation': str})
+    missing = {'threat_type', 'mitigation', 'effectiveness_score'} - set(feedback.columns)
+    if missing:
+        raise ValueError(f"Feedback file is missing columns: {sorted(missing)}")
+    
+    feedback['threat_type'] = feedback['threat_type'].str.strip()
+    feedback['mitigation'] = feedback['mitigation'].str.strip()
+    
+    # Resolve strategy numbers to strategy text
+    def resolve_mitigation(row):
+        strategies = MITIGATION_STRATEGIES.get(row['threat_type'], [])
+        if isinstance(row['mitigation'], str) and row['mitigation'].isdigit():
+            number = int(row['mitigation'])
+            return strategies[number - 1] if 1 <= number <= len(strategies) else None
+        return row['mitigation'] if row['mitigation'] in strategies else None
+    feedback['strategy'] = feedback.apply(resolve_mitigation, axis=1)
+    feedback['score'] = pd.to_numeric(feedback['effectiveness_score'], errors='coerce')
+    
+    # Validate against MITIGATION_STRATEGIES and the 0-10 scale
+    feedback['reason'] = None
+    feedback.loc[~feedback['score'].between(0, 10), 'reason'] = 'effectiveness_score must be a number from 0 to 10'
+    feedback.loc[feedback['strategy'].isna(), 'reason'] = 'unknown mitigation for this threat'
+    feedback.loc[~feedback['threat_type'].isin(list(MITIGATION_STRATEGIES)), 'reason'] = 'unknown threat type'
+    
+    valid = feedback[feedback['reason'].isna()]
+    for threat_type, strategy, score in zip(valid['threat_type'], valid['strategy'], valid['score']):
+        agent.evaluate_mitigation(threat_type, strategy, score, save=False)
+    
+    if len(valid):
+        agent.save_model()
+    
+    rejected = feedback[feedback['reason'].notna()]
+    return {
+        'applied': len(valid),
+        'rejected': len(rejected),
+        'rejected_rows': rejected[['threat_type', 'mitigation', 'effectiveness_score', 'reason']]
+    }
+
 # Example usage
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Forest Threat RL Agent analysis and mitigation feedback.")
+    parser.add_argument('--feedback', help="CSV of mitigation feedback (threat_type, mitigation, effectiveness_score) to apply in bulk")
+    args = parser.parse_args()
+    
+    if args.feedback:
+        summary = ingest_mitigation_feedback(args.feedback)
+        print(f"Applied {summary['applied']} feedback rows, rejected {summary['rejected']}.")
+        if summary['rejected']:
+            print(summary['rejected_rows'].head(20).to_string())
+        sys.exit(0)
+    
     # This section runs when the RL script is executed directly
     print("Forest Threat RL Agent Analysis")
     print("===============================")
@@ -413,6 +620,11 @@ if __name__ == "__main__":
     print(f"Total Predictions: {performance.get('agent_metrics', {}).get('total_predictions', 0)}")
     print(f"Learning Rate: {performance.get('agent_metrics', {}).get('learning_rate', 0)}")
     print(f"Exploration Rate: {performance.get('agent_metrics', {}).get('exploration_rate', 0)}")
+    occupancy = performance.get('agent_metrics', {}).get('occupancy', {})
+    if occupancy.get('max_states'):
+        print(f"Q-table Occupancy: {occupancy['states']}/{occupancy['max_states']} states "
+              f"({occupancy['occupancy']:.1%}), {occupancy['coarse_states']} coarse buckets, "
+              f"{occupancy['evicted_states']} evicted")
     
     # Provide option to evaluate a previous mitigation
     try:
@@ -0,0 +1,193 @@
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from load_data import load_data
+from reinforcement_learning import RLAgent, SEVERITY_CATEGORIES
+
+RL_SWEEP_RESULTS_PATH = '../metrics/rl_sweep_results.csv'
+RL_SWEEP_CURVES_PATH = '../metrics/rl_sweep_curves.csv'
+
+POSSIBLE_SEVERITIES = ["Low", "Medium", "High", "Severe"]
+
+def build_transition_stream(df=None, epochs=1):
+    """
+    Encode dataset rows as the (state, actual severity) stream the RL agent
+    sees in predict_with_feedback, with states bucketed by RLAgent.get_state.
+
+    Returns:
+        tuple: (state_ids, actual_severity_ids, n_states)
+    """
+    if df is None:
+        df = load_data()
+    agent = RLAgent()
+    states = [
+        agent.get_state(threat, temp, precip)
+        for threat, temp, precip in zip(df['Threat Name'], df['Temperature (°C)'], df['Precipitation (mm)'])
+    ]
+    state_ids, _ = pd.factorize(pd.Series(states))
+    severity_ids = df['Severity'].map(SEVERITY_CATEGORIES).map(POSSIBLE_SEVERITIES.index).values
+    return np.tile(state_ids, epochs), np.tile(severity_ids, epochs), int(state_ids.max()) + 1
+
+def sample_configs(n_configs, seed=42):
+    """Random log-uniform learning rates, uniform discount factors and exploration rates."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'learning_rate': np.exp(rng.uniform(np.log(0.01), np.log(0.5), n_configs)),
+        'discount_factor': rng.uniform(0.5, 0.99, n_configs),
+        'exploration_rate': rng.uniform(0.01, 0.3, n_configs)
+    })
+
+def run_population(configs, state_ids, severity_ids, n_states, exploit_interval=500,
+                   exploit_fraction=0.25, curve_interval=100, last_epoch_steps=None, seed=0):
+    """
+    Train a population of RL agents on the same transition stream as one
+    array computation, with population-based training.
+
+    Each step applies RLAgent.predict_with_feedback's epsilon-greedy choice
+    and Q-update to every configuration at once. Q-values live in an
+    (n_configs, n_states, 4) array; a `tried` mask reproduces the Q-table's
+    dict semantics (greedy choice and future_best only over severities tried
+    in that state). Every `exploit_interval` steps the worst configurations
+    copy the Q-table and settings of a top configuration and perturb the
+    settings by x0.8 or x1.2.
+
+    Args:
+        last_epoch_steps (int, optional): Length of the final pass over the
+            data, scored as last_epoch_accuracy (defaults to the whole stream)
+
+    Returns:
+        tuple: (final configs DataFrame, accuracy curves array of shape (n_checkpoints, n_configs))
+    """
+    rng = np.random.default_rng(seed)
+    n_configs = len(configs)
+    learning_rate = configs['learning_rate'].values.astype(float).copy()
+    discount_factor = configs['discount_factor'].values.astype(float).copy()
+    exploration_rate = configs['exploration_rate'].values.astype(float).copy()
+    parent = np.arange(n_configs)
+
+    q_values = np.zeros((n_configs, n_states, len(POSSIBLE_SEVERITIES)))
+    tried = np.zeros((n_configs, n_states, len(POSSIBLE_SEVERITIES)), dtype=bool)
+    configs_idx = np.arange(n_configs)
+
+    total_correct = np.zeros(n_configs)
+    last_epoch_steps = min(last_epoch_steps or len(state_ids), len(state_ids))
+    last_epoch_start = len(state_ids) - last_epoch_steps
+    last_epoch_start_correct = np.zeros(n_configs)
+    interval_correct = np.zeros(n_configs)
+    curves = []
+
+    for step, (state, actual) in enumerate(zip(state_ids, severity_ids), start=1):
+        q_state = q_values[:, state]
+        tried_state = tried[:, state]
+
+        # Greedy over tried severities, random when exploring or nothing tried yet
+        masked = np.where(tried_state, q_state, -np.inf)
+        greedy = masked.argmax(axis=1)
+        explore = (rng.random(n_configs) < exploration_rate) | ~tried_state.any(axis=1)
+        action = np.where(explore, rng.integers(0, len(POSSIBLE_SEVERITIES), n_configs), greedy)
+
+        correct = action == actual
+        reward = np.where(correct, 1.0, -1.0)
+        total_correct += correct
+        interval_correct += correct
+
+        # next_state == state, future_best is taken before the chosen entry is added
+        future_best = np.where(tried_state.any(axis=1), masked.max(axis=1), 0.0)
+        old_value = q_state[configs_idx, action]
+        q_values[configs_idx, state, action] = old_value + learning_rate * (reward + discount_factor * future_best - old_value)
+        tried[configs_idx, state, action] = True
+
+        if step == last_epoch_start:
+            last_epoch_start_correct = total_correct.copy()
+        if step % curve_interval == 0:
+            curves.append(total_correct / step * 100)
+
+        if step % exploit_interval == 0:
+            # Exploit: the bottom fraction copies a random top configuration
+            order = np.argsort(interval_correct)
+            n_replace = int(n_configs * exploit_fraction)
+            if n_replace:
+                losers = order[:n_replace]
+                winners = rng.choice(order[-n_replace:], n_replace)
+                q_values[losers] = q_values[winners]
+                tried[losers] = tried[winners]
+                parent[losers] = parent[winners]
+
+                # Explore: perturb the copied settings
+                def perturb(values):
+                    return np.clip(values[winners] * rng.choice([0.8, 1.2], n_replace), 1e-4, 1.0)
+                learning_rate[losers] = perturb(learning_rate)
+                discount_factor[losers] = np.minimum(perturb(discount_factor), 0.999)
+                exploration_rate[losers] = perturb(exploration_rate)
+            interval_correct[:] = 0
+
+    final = configs.copy()
+    final['final_learning_rate'] = learning_rate
+    final['final_discount_factor'] = discount_factor
+    final['final_exploration_rate'] = exploration_rate
+    final['lineage_parent'] = configs.index.values[parent]
+    final['accuracy'] = total_correct / len(state_ids) * 100
+    # Accuracy over the final pass, long enough to rank configurations by their late settings
+    final['last_epoch_accuracy'] = (total_correct - last_epoch_start_correct) / last_epoch_steps * 100
+    return final, np.array(curves)
+
+def _run_island(args):
+    configs, state_ids, severity_ids, n_states, exploit_interval, curve_interval, last_epoch_steps, seed = args
+    return run_population(configs, state_ids, severity_ids, n_states, exploit_interval=exploit_interval,
+                          curve_interval=curve_interval, last_epoch_steps=last_epoch_steps, seed=seed)
+
+def run_sweep(n_configs=256, epochs=1, workers=None, exploit_interval=500, curve_interval=100, seed=42):
+    """
+    Population-based RL hyperparameter sweep over the replayed dataset.
+
+    The population is split into islands, one per worker process, each
+    running PBT on its own share of configurations over the same stream.
+
+    Returns:
+        tuple: (results DataFrame sorted by last-epoch accuracy, long-format curves DataFrame)
+    """
+    state_ids, severity_ids, n_states = build_transition_stream(epochs=epochs)
+    configs = sample_configs(n_configs, seed)
+
+    workers = min(workers or os.cpu_count(), n_configs)
+    bounds = np.linspace(0, n_configs, workers + 1).astype(int)
+    tasks = [
+        (configs.iloc[a:b], state_ids, severity_ids, n_states, exploit_interval, curve_interval,
+         len(state_ids) // epochs, seed + i)
+        for i, (a, b) in enumerate(zip(bounds[:-1], bounds[1:])) if b > a
+    ]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        islands = list(pool.map(_run_island, tasks))
+
+    results = pd.concat([final for final, _ in islands])
+    curves = np.hstack([curve for _, curve in islands])
+    curves_df = pd.DataFrame(curves, columns=results.index, index=np.arange(1, len(curves) + 1) * curve_interval)
+    curves_df = curves_df.rename_axis('step').reset_index().melt(id_vars='step', var_name='config', value_name='accuracy')
+
+    results = results.rename_axis('config').reset_index().sort_values('last_epoch_accuracy', ascending=False)
+    return results, curves_df
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Population-based sweep of RLAgent hyperparameters over the replayed dataset.")
+    parser.add_argument('--configs', type=int, default=256, help="Number of agent configurations")
+    parser.add_argument('--epochs', type=int, default=3, help="Passes over the dataset")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--exploit-interval', type=int, default=500, help="Steps between exploit/perturb rounds")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results, curves = run_sweep(args.configs, args.epochs, args.workers, args.exploit_interval)
+    elapsed = time.perf_counter() - start
+
+    os.makedirs(os.path.dirname(RL_SWEEP_RESULTS_PATH), exist_ok=True)
+    results.to_csv(RL_SWEEP_RESULTS_PATH, index=False)
+    curves.to_csv(RL_SWEEP_CURVES_PATH, index=False)
+
+    print(f"Swept {args.configs} configurations in {elapsed:.1f}s")
+    print("\nBest configurations:")
+    print(results.head(5)[['final_learning_rate', 'final_discount_factor', 'final_exploration_rate', 'accuracy', 'last_epoch_accuracy']].to_string(index=False))
+    print(f"\nResults saved to {RL_SWEEP_RESULTS_PATH}, accuracy curves to {RL_SWEEP_CURVES_PATH}")
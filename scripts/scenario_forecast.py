@@ -0,0 +1,169 @@
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import joblib
+from prophet_model import ALL_THREATS, parse_future_dates
+from fast_prophet import load_fast_prophet_models
+from forest_health import forest_health_index_array
+from model_io import load_encoders
+
+ENSEMBLE_MODEL_PATH = '../models/ensemble_model.joblib'
+
+# Features that vary across scenarios: temperature, precipitation, severity
+SCENARIO_FEATURES = 3
+
+def split_thresholds(ensemble_model):
+    """
+    Sorted split thresholds of the ensemble's decision tree and XGBoost
+    model for each scenario feature. Between consecutive thresholds both
+    models give the same output.
+    """
+    thresholds = [set() for _ in range(SCENARIO_FEATURES)]
+
+    tree = ensemble_model.named_estimators_['dt'].tree_
+    for feature in range(SCENARIO_FEATURES):
+        thresholds[feature].update(tree.threshold[tree.feature == feature].tolist())
+
+    booster = ensemble_model.named_estimators_['xgb'].get_booster()
+    model = json.loads(booster.save_raw('json'))
+    for xgb_tree in model['learner']['gradient_booster']['model']['trees']:
+        is_split = np.array(xgb_tree['left_children']) != -1
+        features = np.array(xgb_tree['split_indices'])[is_split]
+        conditions = np.array(xgb_tree['split_conditions'], dtype=np.float32)[is_split]
+        for feature in range(SCENARIO_FEATURES):
+            thresholds[feature].update(conditions[features == feature].astype(np.float64).tolist())
+
+    return [np.array(sorted(t)) for t in thresholds]
+
+def cell_keys(values, thresholds):
+    """
+    Integer cell index of each value between sorted thresholds. Values equal
+    to a threshold get their own odd index because the decision tree sends
+    them left (<=) and XGBoost right (<).
+    """
+    return np.searchsorted(thresholds, values, side='left') + np.searchsorted(thresholds, values, side='right')
+
+class ScenarioForecaster:
+    """
+    Monte Carlo version of predict_threats: draws many variance samples per
+    date and pushes all of them through normalization, ensemble scoring,
+    threat selection and the forest health index in one vectorized pass.
+
+    Ensemble scoring is exact but evaluated once per distinct cell of the
+    models' split thresholds, not once per scenario, since tree models are
+    constant within a cell.
+    """
+
+    def __init__(self):
+        self.ensemble_model = joblib.load(ENSEMBLE_MODEL_PATH)
+        ohe_threat_type, le_threat_name = load_encoders()
+        self.threat_names = list(le_threat_name.classes_)
+        self.threat_type_rows = np.asarray(ohe_threat_type.transform(pd.DataFrame({'Threat Type': ['Human Made', 'Natural']})))
+        self.prophet_models = load_fast_prophet_models()
+        self.thresholds = split_thresholds(self.ensemble_model)
+        self.deforestation = self.threat_names.index('Deforestation')
+        self.preferred_by_day = np.array([self.threat_names.index(ALL_THREATS[d % 12]) for d in range(32)])
+
+    def threat_probabilities(self, temp, precip, severity):
+        """Ensemble probability per threat, the max over both threat types as in predict_threats."""
+        features = np.column_stack([temp, precip, severity]).astype(np.float32).astype(np.float64)
+        keys = np.column_stack([cell_keys(features[:, i], self.thresholds[i]) for i in range(SCENARIO_FEATURES)])
+        _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+
+        representatives = features[first]
+        proba = None
+        for threat_type_row in self.threat_type_rows:
+            X = np.hstack([representatives, np.tile(threat_type_row, (len(representatives), 1))])
+            type_proba = self.ensemble_model.predict_proba(pd.DataFrame(X, columns=self.ensemble_model.feature_names_in_))
+            proba = type_proba if proba is None else np.maximum(proba, type_proba)
+        return proba[inverse.ravel()]
+
+    def simulate(self, dates, n_scenarios, rng):
+        """Scenario arrays of shape (dates, n_scenarios)."""
+        temp_model, precip_model, severity_model = self.prophet_models
+        temp_raw = temp_model.predict(dates)['yhat'].values[:, None]
+        precip_raw = precip_model.predict(dates)['yhat'].values[:, None]
+        severity_raw = severity_model.predict(dates)['yhat'].values[:, None]
+
+        # Same ±15% / ±20% / ±30% variance and normalization as predict_threats
+        shape = (len(dates), n_scenarios)
+        temp_variance = 1 + (rng.random(shape) - 0.5) * 0.3
+        precip_variance = 1 + (rng.random(shape) - 0.5) * 0.4
+        severity_variance = 1 + (rng.random(shape) - 0.5) * 0.6
+
+        temp = np.clip((temp_raw % 100) * 0.4 * temp_variance, 0, 40)
+        precip = np.clip((precip_raw % 500) * precip_variance, 0, 500)
+        severity = np.clip(np.round(np.abs(severity_raw * severity_variance) % 10), 1, 10)
+
+        proba = self.threat_probabilities(temp.ravel(), precip.ravel(), severity.ravel()).reshape(*shape, -1)
+
+        # Threat selection: damp Deforestation, boost the day's preferred threat,
+        # then draw among threats within 60% of the top probability
+        proba[..., self.deforestation] *= 0.5
+        preferred = self.preferred_by_day[dates.day.values]
+        proba[np.arange(len(dates)), :, preferred] *= 1.8
+        weights = np.where(proba >= proba.max(axis=-1, keepdims=True) * 0.6, proba, 0)
+        cumulative = weights.cumsum(axis=-1)
+        draw = rng.random(shape)[..., None] * cumulative[..., -1:]
+        threat = np.minimum((cumulative <= draw).sum(axis=-1), len(self.threat_names) - 1)
+
+        health = np.stack([forest_health_index_array(temp[i], precip[i], month) for i, month in enumerate(dates.month)])
+        return temp, precip, severity, health, threat
+
+    def forecast(self, date_strs, n_scenarios=10000, percentiles=(5, 50, 95), seed=None, dates_per_chunk=32):
+        """
+        Percentile bands and per-threat occurrence probabilities per date.
+
+        Args:
+            date_strs (list): Date strings in format "DD Month" or "DD Month YYYY"
+            n_scenarios (int): Variance samples per date
+            percentiles (tuple): Percentiles reported for each quantity
+            seed (int, optional): Seed for reproducible scenarios
+            dates_per_chunk (int): Dates processed together, bounds memory
+
+        Returns:
+            tuple: (bands DataFrame indexed by date, threat probability DataFrame dates x threats)
+        """
+        rng = np.random.default_rng(seed)
+        dates = parse_future_dates(date_strs)
+        bands, threat_probabilities = [], []
+
+        for start in range(0, len(dates), dates_per_chunk):
+            chunk = dates[start:start + dates_per_chunk]
+            temp, precip, severity, health, threat = self.simulate(chunk, n_scenarios, rng)
+
+            band = {}
+            for name, values in [('Temperature (°C)', temp), ('Precipitation (mm)', precip),
+                                 ('Severity (1-10)', severity), ('Forest Health Index (0-100)', health)]:
+                for p, column in zip(percentiles, np.percentile(values, percentiles, axis=1)):
+                    band[f'{name} p{p}'] = column
+            # Alert rules: severity > 7, High/Severe wildlife impact (severity >= 7) or health < 60
+            band['Alert Probability'] = ((severity >= 7) | (health < 60)).mean(axis=1)
+            bands.append(pd.DataFrame(band, index=chunk))
+
+            counts = np.stack([np.bincount(row, minlength=len(self.threat_names)) for row in threat])
+            threat_probabilities.append(pd.DataFrame(counts / n_scenarios, index=chunk, columns=self.threat_names))
+
+        return pd.concat(bands).rename_axis('Date'), pd.concat(threat_probabilities).rename_axis('Date')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo scenario forecast of forest threats.")
+    parser.add_argument('--start', default=pd.Timestamp.now().strftime('%d %B %Y'), help="First date (DD Month YYYY)")
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--scenarios', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    start_date = parse_future_dates([args.start])[0]
+    date_strs = [d.strftime('%d %B %Y') for d in pd.date_range(start_date, periods=args.days, freq='D')]
+
+    forecaster = ScenarioForecaster()
+    start = time.perf_counter()
+    bands, threat_probabilities = forecaster.forecast(date_strs, args.scenarios, seed=args.seed)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.scenarios:,} scenarios x {args.days} days in {elapsed:.1f}s")
+    print(bands.head().round(1).to_string())
+    print(threat_probabilities.head().round(3).to_string())
@@ -0,0 +1,355 @@
+import json
+import time
+import random
+import asyncio
+import argparse
+from collections import deque
+import numpy as np
+import pandas as pd
+import joblib
+from load_data import load_data
+from prophet_model import ALL_THREATS, WILDLIFE_MAPPING, get_threat_type
+from forest_health import calculate_forest_health_index
+from model_io import load_encoders
+from threat_prediction import alert_thresholds_met
+from drift_monitor import DriftMonitor, threat_probabilities, threat_type_rows
+
+ENSEMBLE_MODEL_PATH = '../models/ensemble_model.joblib'
+
+class RollingWindow:
+    """Fixed-size window over a numeric stream with O(1) push, mean and lag lookups."""
+
+    def __init__(self, size):
+        self.values = deque(maxlen=size)
+        self.total = 0.0
+
+    def push(self, value):
+        if len(self.values) == self.values.maxlen:
+            self.total -= self.values[0]
+        self.values.append(value)
+        self.total += value
+
+    def mean(self):
+        return self.total / len(self.values) if self.values else None
+
+    def lag(self, k):
+        """Value k events ago (lag(0) is the latest)."""
+        return self.values[-1 - k] if k < len(self.values) else None
+
+class ThreatWindows:
+    """
+    Rolling features updated incrementally per sensor event: global climate
+    moving averages, per-threat moving averages and lags, and per-threat
+    counts over the last `count_window` observed threats.
+    """
+
+    def __init__(self, window_size=24, count_window=100):
+        self.temperature = RollingWindow(window_size)
+        self.precipitation = RollingWindow(window_size)
+        self.severity = RollingWindow(window_size)
+        self.per_threat = {
+            threat: {'temperature': RollingWindow(window_size),
+                     'precipitation': RollingWindow(window_size),
+                     'severity': RollingWindow(window_size)}
+            for threat in ALL_THREATS
+        }
+        self.recent_threats = deque(maxlen=count_window)
+        self.counts = dict.fromkeys(ALL_THREATS, 0)
+
+    def update(self, event):
+        """Applies one event, returns True if a new threat was observed."""
+        self.temperature.push(event['temperature'])
+        self.precipitation.push(event['precipitation'])
+        if event.get('severity') is not None:
+            self.severity.push(event['severity'])
+
+        threat = event.get('threat')
+        if threat not in self.per_threat:
+            return False
+
+        windows = self.per_threat[threat]
+        windows['temperature'].push(event['temperature'])
+        windows['precipitation'].push(event['precipitation'])
+        if event.get('severity') is not None:
+            windows['severity'].push(event['severity'])
+
+        if len(self.recent_threats) == self.recent_threats.maxlen:
+            self.counts[self.recent_threats[0]] -= 1
+        self.recent_threats.append(threat)
+        self.counts[threat] += 1
+        return self.counts[threat] == 1
+
+    def features(self):
+        """Snapshot of the current window features."""
+        return {
+            'temperature_ma': self.temperature.mean(),
+            'precipitation_ma': self.precipitation.mean(),
+            'severity_ma': self.severity.mean(),
+            'temperature_lag1': self.temperature.lag(1),
+            'precipitation_lag1': self.precipitation.lag(1),
+            'threat_counts': dict(self.counts),
+            'threat_temperature_ma': {t: w['temperature'].mean() for t, w in self.per_threat.items()},
+            'threat_severity_ma': {t: w['severity'].mean() for t, w in self.per_threat.items()}
+        }
+
+class ThreatScorer:
+    """
+    Scores window features the way predict_threats scores a forecast: ensemble
+    probabilities over both threat types with Deforestation damped, wildlife
+    impact mapped from severity and the forest health index. Models are loaded
+    once. The date-seeded diversity and RL update of predict_threats are
+    left out so scores are deterministic and cheap.
+    """
+
+    def __init__(self):
+        self.ensemble_model = joblib.load(ENSEMBLE_MODEL_PATH)
+        ohe_threat_type, self.le_threat_name = load_encoders()
+        self.threat_names = self.le_threat_name.classes_
+        self.threat_type_rows = threat_type_rows(ohe_threat_type)
+
+    def score(self, temperature, precipitation, severity, month):
+        temperature = max(0, min(40, temperature))
+        precipitation = max(0, min(500, precipitation))
+        severity = max(1, min(10, int(round(severity))))
+
+        proba = threat_probabilities(self.ensemble_model, self.threat_type_rows, self.threat_names,
+                                     [[temperature, precipitation, severity]])[0]
+        threat_name = self.threat_names[proba.argmax()]
+
+        return {
+            'Most Likely Threat': threat_name,
+            'Threat Type': get_threat_type(threat_name),
+            'Predicted Wildlife Impact': WILDLIFE_MAPPING.get(severity, "Medium"),
+            'Predicted Temperature (°C)': round(temperature, 1),
+            'Predicted Precipitation (mm)': round(precipitation, 1),
+            'Predicted Severity (1-10)': severity,
+            'Forest Health Index (0-100)': round(calculate_forest_health_index(temperature, precipitation, month), 1)
+        }
+
+class LatencyTracker:
+    """Keeps the most recent event-to-alert latencies for percentile reporting."""
+
+    def __init__(self, size=10000):
+        self.latencies = deque(maxlen=size)
+
+    def record(self, seconds):
+        self.latencies.append(seconds)
+
+    def summary(self):
+        if not self.latencies:
+            return {}
+        values = np.fromiter(self.latencies, dtype=float) * 1000
+        return {
+            'count': len(values),
+            'p50_ms': float(np.percentile(values, 50)),
+            'p99_ms': float(np.percentile(values, 99)),
+            'max_ms': float(values.max())
+        }
+
+def parse_event(line):
+    """
+    Parses one sensor reading. Accepts JSON lines with temperature,
+    precipitation and optional threat/severity/timestamp keys (dataset column
+    names also work), or CSV lines "temperature,precipitation[,threat[,severity]]".
+    """
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith('{'):
+        record = json.loads(line)
+        event = {
+            'temperature': float(record.get('temperature', record.get('Temperature (°C)'))),
+            'precipitation': float(record.get('precipitation', record.get('Precipitation (mm)'))),
+            'threat': record.get('threat', record.get('Threat Name')),
+            'severity': record.get('severity', record.get('Severity')),
+            'timestamp': record.get('timestamp')
+        }
+    else:
+        fields = line.split(',')
+        event = {
+            'temperature': float(fields[0]),
+            'precipitation': float(fields[1]),
+            'threat': fields[2].strip() if len(fields) > 2 and fields[2].strip() else None,
+            'severity': float(fields[3]) if len(fields) > 3 and fields[3].strip() else None,
+            'timestamp': None
+        }
+    if event['severity'] is not None:
+        event['severity'] = float(event['severity'])
+    if event['timestamp'] is not None:
+        event['timestamp'] = pd.Timestamp(event['timestamp'])
+    return event
+
+async def tail_file(path, queue, from_start=False, poll_interval=0.05):
+    """Follows a file like `tail -f` and queues each parsed line."""
+    with open(path, 'r', encoding='utf-8') as f:
+        if not from_start:
+            f.seek(0, 2)
+        while True:
+            line = f.readline()
+            if not line:
+                await asyncio.sleep(poll_interval)
+                continue
+            await _enqueue(queue, line)
+
+async def serve_socket(host, port, queue):
+    """Accepts line-delimited readings over TCP."""
+    async def handle(reader, writer):
+        while line := await reader.readline():
+            await _enqueue(queue, line.decode('utf-8'))
+        writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"Listening for sensor readings on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+async def _enqueue(queue, line):
+    try:
+        event = parse_event(line)
+    except (ValueError, TypeError, KeyError, json.JSONDecodeError) as e:
+        print(f"Skipping malformed reading: {e}")
+        return
+    if event is not None:
+        await queue.put((time.perf_counter(), event))
+
+class StreamingPipeline:
+    """
+    Consumes sensor events, keeps ThreatWindows current and re-scores when the
+    windows change meaningfully: the temperature or precipitation moving
+    average moves past a threshold since the last score, or a threat appears
+    that is not in the recent count window.
+
+    Events that arrive while scoring are coalesced: the consumer drains the
+    whole queue before scoring once, so a burst costs one score and latency
+    stays bounded by a single scoring pass plus the drain.
+
+    The forest health index uses the month of the latest event timestamp,
+    or of the clock at scoring time, unless a fixed month is given.
+    """
+
+    def __init__(self, scorer, on_alert=None, window_size=24, count_window=100,
+                 temp_threshold=1.0, precip_threshold=10.0, month=None, monitor=None):
+        self.scorer = scorer
+        self.monitor = monitor
+        self.on_alert = on_alert or (lambda result: print(f"ALERT: {result}"))
+        self.windows = ThreatWindows(window_size, count_window)
+        self.temp_threshold = temp_threshold
+        self.precip_threshold = precip_threshold
+        self.month = month
+        self.last_timestamp = None
+        self.latency = LatencyTracker()
+        self.last_scored = None
+        self.events = 0
+        self.scores = 0
+        self.alerts = 0
+
+    def current_month(self):
+        if self.month is not None:
+            return self.month
+        if self.last_timestamp is not None:
+            return self.last_timestamp.month
+        return pd.Timestamp.now().month
+
+    def changed_meaningfully(self, new_threat_seen):
+        if new_threat_seen or self.last_scored is None:
+            return True
+        temp_ma = self.windows.temperature.mean()
+        precip_ma = self.windows.precipitation.mean()
+        return (abs(temp_ma - self.last_scored[0]) >= self.temp_threshold or
+                abs(precip_ma - self.last_scored[1]) >= self.precip_threshold)
+
+    def process(self, batch):
+        """Applies a drained batch of (received_at, event) pairs, scores once if needed."""
+        triggered_at = None
+        for received_at, event in batch:
+            self.events += 1
+            if event.get('timestamp') is not None:
+                self.last_timestamp = event['timestamp']
+            if self.monitor is not None:
+                self.monitor.observe_inputs(event['temperature'], event['precipitation'], event.get('severity'))
+            new_threat_seen = self.windows.update(event)
+            if triggered_at is None and self.changed_meaningfully(new_threat_seen):
+                triggered_at = received_at
+
+        if triggered_at is None:
+            return None
+
+        temp_ma = self.windows.temperature.mean()
+        precip_ma = self.windows.precipitation.mean()
+        severity_ma = self.windows.severity.mean() or 5
+        result = self.scorer.score(temp_ma, precip_ma, severity_ma, self.current_month())
+        self.last_scored = (temp_ma, precip_ma)
+        self.scores += 1
+        if self.monitor is not None:
+            self.monitor.observe_prediction(result['Most Likely Threat'])
+
+        if alert_thresholds_met(result):
+            self.alerts += 1
+            self.on_alert(result)
+        # Latency of the oldest event that triggered this score
+        self.latency.record(time.perf_counter() - triggered_at)
+        return result
+
+    async def run(self, queue):
+        while True:
+            batch = [await queue.get()]
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            self.process(batch)
+            for _ in batch:
+                queue.task_done()
+
+async def simulate(queue, n_events, burst_size=200, pause=0.05, seed=42):
+    """Replays dataset rows as bursty sensor readings."""
+    df = load_data()
+    rng = random.Random(seed)
+    rows = df.sample(n=n_events, replace=True, random_state=seed)
+    sent = 0
+    for _, row in rows.iterrows():
+        await queue.put((time.perf_counter(), {
+            'temperature': float(row['Temperature (°C)']),
+            'precipitation': float(row['Precipitation (mm)']),
+            'threat': row['Threat Name'],
+            'severity': float(row['Severity'])
+        }))
+        sent += 1
+        if sent % burst_size == 0:
+            await asyncio.sleep(pause * rng.random())
+
+async def main(args):
+    queue = asyncio.Queue(maxsize=args.queue_size)
+    monitor = DriftMonitor() if args.monitor else None
+    pipeline = StreamingPipeline(ThreatScorer(), on_alert=(lambda result: None) if args.quiet else None,
+                                 window_size=args.window_size, monitor=monitor)
+    consumer = asyncio.create_task(pipeline.run(queue))
+
+    if args.file:
+        await tail_file(args.file, queue, from_start=args.from_start)
+    elif args.port:
+        await serve_socket(args.host, args.port, queue)
+    else:
+        start = time.perf_counter()
+        await simulate(queue, args.simulate)
+        await queue.join()
+        elapsed = time.perf_counter() - start
+        print(f"Processed {pipeline.events} events in {elapsed:.2f}s "
+              f"({pipeline.events / elapsed:.0f} events/s), {pipeline.scores} scores, {pipeline.alerts} alerts")
+        print("Event-to-alert latency:", pipeline.latency.summary())
+        if monitor is not None:
+            snapshot = monitor.snapshot()
+            print("Input drift PSI:", {name: round(stats['psi'], 3) for name, stats in snapshot['inputs'].items()})
+            print("Prediction drift PSI:", round(snapshot['predictions']['psi'], 3))
+    consumer.cancel()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream sensor readings through rolling threat windows and alert scoring.")
+    parser.add_argument('--file', help="Follow a file of line-delimited readings")
+    parser.add_argument('--from-start', action='store_true', help="Read the followed file from the beginning")
+    parser.add_argument('--port', type=int, help="Accept readings over TCP on this port")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--simulate', type=int, default=20000, help="Replay this many dataset rows as bursty events")
+    parser.add_argument('--window-size', type=int, default=24)
+    parser.add_argument('--queue-size', type=int, default=10000)
+    parser.add_argument('--monitor', action='store_true', help="Track input and prediction drift against the reference profile")
+    parser.add_argument('--quiet', action='store_true', help="Do not print alerts")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,237 @@
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import joblib
+from sklearn.ensemble import VotingClassifier
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder, OneHotEncoder
+from sklearn.metrics import accuracy_score
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.utils import murmurhash3_32
+from xgboost import XGBClassifier
+from load_data import load_data
+
+SPARSE_ENSEMBLE_PATH = '../models/sparse_ensemble_model.joblib'
+SPARSE_ENCODERS_PATH = '../models/sparse_encoders.joblib'
+SPARSE_BENCHMARK_PATH = '../metrics/sparse_feature_benchmark.csv'
+
+NUMERIC_COLUMNS = ['Temperature (°C)', 'Precipitation (mm)', 'Severity']
+
+class SparseFeatureEncoder:
+    """
+    Encodes numeric and categorical columns straight into a CSR matrix.
+
+    Numeric columns come first and are always stored, zeros included, so
+    XGBoost sees a measured 0 mm of rain as 0 and not as missing. Each
+    categorical column follows as a one-hot block in sorted category order
+    (unknown categories are ignored, as with handle_unknown='ignore').
+    With only 'Threat Type' this reproduces the trainers' five-column layout.
+
+    Columns listed in hash_columns, or with more than max_categories training
+    categories, are hashed into n_hash_features buckets instead, so the
+    width stays fixed however many IDs appear.
+    """
+
+    def __init__(self, categorical_columns=('Threat Type',), numeric_columns=NUMERIC_COLUMNS,
+                 hash_columns=(), max_categories=None, n_hash_features=2 ** 12):
+        self.categorical_columns = list(categorical_columns)
+        self.numeric_columns = list(numeric_columns)
+        self.hash_columns = list(hash_columns)
+        self.max_categories = max_categories
+        self.n_hash_features = n_hash_features
+
+    def fit(self, df):
+        self.categories_ = {}
+        self.hashed_ = []
+        for column in self.categorical_columns:
+            categories = sorted(df[column].dropna().unique())
+            if column in self.hash_columns or (self.max_categories and len(categories) > self.max_categories):
+                self.hashed_.append(column)
+            else:
+                self.categories_[column] = pd.Index(categories)
+        self.n_features_ = len(self.numeric_columns) + sum(
+            self.n_hash_features if column in self.hashed_ else len(self.categories_[column])
+            for column in self.categorical_columns
+        )
+        return self
+
+    def _codes(self, column, values):
+        """Index within the column's block, -1 for unknown or missing values."""
+        if column in self.hashed_:
+            codes, uniques = pd.factorize(values)
+            buckets = np.array([murmurhash3_32(str(u), positive=True) % self.n_hash_features for u in uniques], dtype=np.int64)
+            return np.where(codes >= 0, buckets[np.maximum(codes, 0)] if len(buckets) else -1, -1)
+        return self.categories_[column].get_indexer(values)
+
+    def transform(self, df):
+        n_rows = len(df)
+        width = len(self.numeric_columns) + len(self.categorical_columns)
+        indices = np.empty((n_rows, width), dtype=np.int32)
+        data = np.ones((n_rows, width), dtype=np.float32)
+        stored = np.ones((n_rows, width), dtype=bool)
+
+        for j, column in enumerate(self.numeric_columns):
+            indices[:, j] = j
+            data[:, j] = df[column].values
+
+        offset = len(self.numeric_columns)
+        for j, column in enumerate(self.categorical_columns, start=len(self.numeric_columns)):
+            codes = self._codes(column, df[column].values)
+            indices[:, j] = offset + codes
+            stored[:, j] = codes >= 0
+            offset += self.n_hash_features if column in self.hashed_ else len(self.categories_[column])
+
+        # Entries are already in increasing column order within each row
+        indptr = np.concatenate([[0], np.cumsum(stored.sum(axis=1))])
+        return sp.csr_matrix((data[stored], indices[stored], indptr), shape=(n_rows, self.n_features_))
+
+    def fit_transform(self, df):
+        return self.fit(df).transform(df)
+
+    def get_feature_names_out(self):
+        names = list(self.numeric_columns)
+        for column in self.categorical_columns:
+            if column in self.hashed_:
+                names += [f'{column}_hash{i}' for i in range(self.n_hash_features)]
+            else:
+                names += [f'{column}_{category}' for category in self.categories_[column]]
+        return np.array(names)
+
+def matrix_nbytes(X):
+    """Memory held by a dense array or a CSR matrix's data, indices and indptr."""
+    if sp.issparse(X):
+        return X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+    return X.nbytes
+
+def predict_proba_batched(model, encoder, df, batch_size=100_000):
+    """Threat probabilities for raw rows, encoded to CSR and scored batch by batch."""
+    return np.vstack([
+        model.predict_proba(encoder.transform(df.iloc[start:start + batch_size]))
+        for start in range(0, len(df), batch_size)
+    ])
+
+def train_sparse_ensemble(df=None, categorical_columns=('Threat Type',), hash_columns=(), max_categories=None,
+                          n_hash_features=2 ** 12, n_estimators=100, save=True):
+    """
+    Train the soft-voting Decision Tree + XGBoost ensemble on CSR features.
+
+    Same models and split as ensemble_model.py, but features stay sparse from
+    encoding through training, so extra categorical columns (site, species,
+    sensor IDs) only add stored entries per row, not dense columns.
+
+    Returns:
+        tuple: (ensemble, SparseFeatureEncoder, LabelEncoder, test accuracy)
+    """
+    if df is None:
+        df = load_data()
+
+    le_threat_name = LabelEncoder()
+    y = le_threat_name.fit_transform(df['Threat Name'])
+    df_train, df_test, y_train, y_test = train_test_split(df, y, test_size=0.2, random_state=42)
+
+    encoder = SparseFeatureEncoder(categorical_columns, hash_columns=hash_columns,
+                                   max_categories=max_categories, n_hash_features=n_hash_features)
+    X_train = encoder.fit_transform(df_train)
+
+    ensemble = VotingClassifier(
+        estimators=[('dt', DecisionTreeClassifier(max_depth=10, min_samples_split=5, random_state=42)),
+                    ('xgb', XGBClassifier(n_estimators=n_estimators, learning_rate=0.1, max_depth=5, random_state=42))],
+        voting='soft'
+    )
+    ensemble.fit(X_train, y_train)
+    accuracy = accuracy_score(y_test, predict_proba_batched(ensemble, encoder, df_test).argmax(axis=1))
+
+    if save:
+        joblib.dump(ensemble, SPARSE_ENSEMBLE_PATH)
+        joblib.dump((encoder, le_threat_name), SPARSE_ENCODERS_PATH)
+    return ensemble, encoder, le_threat_name, accuracy
+
+def simulate_high_cardinality(n_rows, n_categories, seed=42):
+    """
+    Dataset rows resampled with site, species and sensor ID columns of
+    n_categories values each (Zipf-like, so a few IDs are common).
+    """
+    base = load_data()
+    rng = np.random.default_rng(seed)
+    df = base.iloc[rng.integers(0, len(base), n_rows)].reset_index(drop=True)
+    weights = 1 / np.arange(1, n_categories + 1)
+    weights /= weights.sum()
+    for column in ['Site ID', 'Species', 'Sensor ID']:
+        df[column] = pd.Series(rng.choice(n_categories, n_rows, p=weights)).map(lambda i, c=column: f'{c[:4]}-{i}')
+    return df
+
+def benchmark(n_rows=50_000, category_counts=(10, 100, 1000, 10000), n_estimators=20,
+              n_hash_features=2 ** 10, dense_limit_mb=2048):
+    """
+    Feature memory and training time of the dense path (OneHotEncoder with
+    sparse_output=False and np.hstack, as the trainers do), the CSR path and
+    the hashed CSR path, as the number of categories per ID column grows.
+
+    The dense path is skipped when its matrix would exceed dense_limit_mb.
+
+    Returns:
+        pd.DataFrame: One row per (categories, path)
+    """
+    categorical_columns = ['Threat Type', 'Site ID', 'Species', 'Sensor ID']
+    rows = []
+    for n_categories in category_counts:
+        df = simulate_high_cardinality(n_rows, n_categories)
+        y = LabelEncoder().fit_transform(df['Threat Name'])
+
+        paths = {
+            'sparse': lambda: SparseFeatureEncoder(categorical_columns).fit_transform(df),
+            'hashed': lambda: SparseFeatureEncoder(categorical_columns, hash_columns=categorical_columns[1:],
+                                                   n_hash_features=n_hash_features).fit_transform(df)
+        }
+        n_dense_features = len(NUMERIC_COLUMNS) + sum(df[column].nunique() for column in categorical_columns)
+        dense_mb = n_rows * n_dense_features * 8 / 2 ** 20
+        if dense_mb <= dense_limit_mb:
+            def dense():
+                ohe = OneHotEncoder(sparse_output=False, handle_unknown='ignore')
+                return np.hstack([df[NUMERIC_COLUMNS].values, ohe.fit_transform(df[categorical_columns])])
+            paths = {'dense': dense, **paths}
+        else:
+            rows.append({'categories': n_categories, 'path': 'dense', 'features': n_dense_features,
+                         'feature_mb': dense_mb, 'skipped': True})
+
+        for path, encode in paths.items():
+            start = time.perf_counter()
+            X = encode()
+            encode_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            DecisionTreeClassifier(max_depth=10, min_samples_split=5, random_state=42).fit(X, y)
+            dt_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            XGBClassifier(n_estimators=n_estimators, learning_rate=0.1, max_depth=5, random_state=42).fit(X, y)
+            xgb_seconds = time.perf_counter() - start
+
+            rows.append({'categories': n_categories, 'path': path, 'features': X.shape[1],
+                         'feature_mb': matrix_nbytes(X) / 2 ** 20, 'encode_seconds': encode_seconds,
+                         'decision_tree_seconds': dt_seconds, 'xgboost_seconds': xgb_seconds, 'skipped': False})
+            del X
+    return pd.DataFrame(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the ensemble on sparse features or benchmark sparse vs dense.")
+    parser.add_argument('--benchmark', action='store_true', help="Compare dense, sparse and hashed paths on simulated ID columns")
+    parser.add_argument('--rows', type=int, default=50_000)
+    parser.add_argument('--categories', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--rounds', type=int, default=20, help="XGBoost rounds in the benchmark")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        results = benchmark(args.rows, args.categories, args.rounds)
+        os.makedirs(os.path.dirname(SPARSE_BENCHMARK_PATH), exist_ok=True)
+        results.to_csv(SPARSE_BENCHMARK_PATH, index=False)
+        print(results.round(3).to_string(index=False))
+        print(f"\nBenchmark saved to {SPARSE_BENCHMARK_PATH}")
+    else:
+        _, encoder, _, accuracy = train_sparse_ensemble()
+        print("Sparse Ensemble Model Accuracy:", accuracy)
+        print("Features:", encoder.get_feature_names_out().tolist())
+        print(f"Sparse ensemble and encoders saved to {SPARSE_ENSEMBLE_PATH}, {SPARSE_ENCODERS_PATH}")
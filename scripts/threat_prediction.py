@@ -1,4 +1,3 @@
-from twilio_alerts import send_threat_alert
 import pandas as pd
 import numpy as np
 from datetime import datetime
@@ -9,6 +8,10 @@ import sys
 sys.path.append('D:/vscode/Forest Threat Detection/scripts')
 
 from reinforcement_learning import reinforce_predictions
+from forest_health import calculate_forest_health_index
+from prophet_model import ALL_THREATS, WILDLIFE_MAPPING
+from model_io import load_encoders
+from drift_monitor import threat_probabilities, threat_type_rows
 
 def load_models():
     ensemble_model = joblib.load('../models/ensemble_model.joblib')
@@ -51,131 +54,83 @@ def get_threat_type(threat_name):
     }
     return threat_types.get(threat_name, 'Unknown')
 
-def calculate_forest_health_index(predicted_temp, predicted_precip):
-    # Normalize the inputs to ensure a reasonable index
-    # Assuming normal range for temperature: 0-40°C
-    # Assuming normal range for precipitation: 0-500mm
-    
-    normalized_temp = max(0, min(40, predicted_temp)) / 40  # 0 to 1 scale
-    normalized_precip = max(0, min(500, predicted_precip)) / 500  # 0 to 1 scale
-    
-    # Calculate health index (0-100 scale where higher is better)
-    # More aggressive scaling to allow for lower health index values
-    health_index = 100 - (normalized_temp * 80) + (normalized_precip * 30)
-    
-    # Scale final value to ensure full range
-    health_index = max(0, min(100, health_index))
-    
-    # Add seasonal variations based on month
-    current_month = datetime.now().month
-    if 5 <= current_month <= 8:  # Summer months
-        # Summer can be harder on forests with heat stress
-        health_index *= 0.9  # Reduce by 10%
-    elif 11 <= current_month <= 2:  # Winter months
-        # Winter dormancy can show as reduced health
-        health_index *= 0.95  # Reduce by 5%
-    
-    return health_index
-
-def predict_threats(date_str):
-    if len(date_str.split()) == 2:
-        current_year = datetime.now().year
-        date_str += f" {current_year}"
-        
-    def safe_transform(encoder, value):
-        try:
-            return encoder.transform([[value]])
-        except Exception as e:
-            # If transformation fails, create a zero array of appropriate size
-            if hasattr(encoder, 'get_feature_names_out'):
-                # For OneHotEncoder
-                num_features = len(encoder.get_feature_names_out())
-                return np.zeros((1, num_features))
-            else:
-                # For LabelEncoder
-                return np.array([0])
-
-    # Load models and encoders with improved error handling
+def safe_transform(encoder, value):
     try:
-        ensemble_model = joblib.load('../models/ensemble_model.joblib')
-        
-        # Prophet models
-        try:
-            temp_model, precip_model, severity_model, wildlife_model = joblib.load('../models/prophet_models.joblib')
-        except Exception as e:
-            print(f"Error loading prophet models: {e}")
-            raise
-        
-        # Handle different encoder structures more robustly
-        encoders = joblib.load('../models/encoders.joblib')
-        
-        # Check what type of encoders we're dealing with
-        if isinstance(encoders, tuple) and len(encoders) >= 2:
-            # Multiple encoders as expected
-            if len(encoders) >= 3:  
-                # First attempt with original expected order
-                ohe_threat_type, le_threat_name, le_wildlife = encoders
-            else:
-                # Alternative order with just two encoders
-                ohe_threat_type, le_threat_name = encoders
-                le_wildlife = None  # Not used directly in this function anyway
-        elif hasattr(encoders, 'transform'):  
-            # Single encoder - likely the OneHotEncoder for threat_type
-            ohe_threat_type = encoders
-            
-            # Create simple LabelEncoder for threat names if needed
-            from sklearn.preprocessing import LabelEncoder
-            le_threat_name = LabelEncoder()
-            le_threat_name.fit(['Deforestation', 'Drought', 'Disease', 'Fire', 'Flood',
-                               'Landslide', 'Lightning', 'Overgrazing', 'Poaching',
-                               'Pollution', 'Storm', 'Earthquake'])
-            le_wildlife = None
-        else:
-            print("Unrecognized encoder format")
-            raise ValueError("Cannot interpret encoder format")
-            
+        # Encoders fitted on a DataFrame expect the same column names
+        if hasattr(encoder, 'feature_names_in_'):
+            return encoder.transform(pd.DataFrame([[value]], columns=encoder.feature_names_in_))
+        return encoder.transform([[value]])
     except Exception as e:
-        print(f"Error loading models: {e}")
-        raise
+        # If transformation fails, create a zero array of appropriate size
+        if hasattr(encoder, 'get_feature_names_out'):
+            # For OneHotEncoder
+            num_features = len(encoder.get_feature_names_out())
+            return np.zeros((1, num_features))
+        else:
+            # For LabelEncoder
+            return np.array([0])
 
-    future_date = pd.to_datetime(date_str, format='%d %B %Y')
-    future_temp_df = pd.DataFrame({'ds': [future_date]})
-    future_precip_df = pd.DataFrame({'ds': [future_date]})
-    future_severity_df = pd.DataFrame({'ds': [future_date]})
+def scale_forecasts(future_date, predicted_temp_raw, predicted_precip_raw, predicted_severity_raw):
+    """
+    Apply the date-seeded variance to raw Prophet forecasts and scale them
+    to the model input ranges, before clamping.
 
-    # Get raw predictions
-    predicted_temp_raw = temp_model.predict(future_temp_df)['yhat'].values[0]
-    predicted_precip_raw = precip_model.predict(future_precip_df)['yhat'].values[0]
-    predicted_severity_raw = severity_model.predict(future_severity_df)['yhat'].values[0]
-    
+    Returns:
+        tuple: (temp, precip, severity, date_seed)
+    """
     # Add more significant variance for truly diverse predictions
     # Use the date as a seed for reproducible randomness
     date_seed = int(future_date.strftime('%Y%m%d'))
     random.seed(date_seed)
-    
+
     # Add stronger variance to predictions
     temp_variance = 1 + (random.random() - 0.5) * 0.3    # ±15%
     precip_variance = 1 + (random.random() - 0.5) * 0.4  # ±20%
     severity_variance = 1 + (random.random() - 0.5) * 0.6  # ±30%
-    
+
     # Normalize the values to reasonable ranges with added variance
-    predicted_temp = max(0, min(40, (predicted_temp_raw % 100) * 0.4 * temp_variance))
-    predicted_precip = max(0, min(500, (predicted_precip_raw % 500) * precip_variance))
-    predicted_severity = max(1, min(10, round(abs(predicted_severity_raw * severity_variance) % 10)))
-    if predicted_severity == 0:
-        predicted_severity = 1
-    
-    # Define all threats for consistent use
-    all_threats = [
-        'Deforestation', 'Drought', 'Disease', 'Fire', 'Flood',
-        'Landslide', 'Lightning', 'Overgrazing', 'Poaching',
-        'Pollution', 'Storm', 'Earthquake'
-    ]
-    
-    # Get month and day for diversity mechanisms
-    month_value = future_date.month
+    temp = (predicted_temp_raw % 100) * 0.4 * temp_variance
+    precip = (predicted_precip_raw % 500) * precip_variance
+    severity = round(abs(predicted_severity_raw * severity_variance) % 10)
+
+    return temp, precip, severity, date_seed
+
+def clamp_inputs(temp, precip, severity):
+    """Clamps model inputs to the ranges in drift_monitor.CLAMP_RANGES."""
+    return max(0, min(40, temp)), max(0, min(500, precip)), max(1, min(10, severity))
+
+def apply_forecast_variance(future_date, predicted_temp_raw, predicted_precip_raw, predicted_severity_raw):
+    """
+    Apply the date-seeded variance to raw Prophet forecasts and normalize them.
+
+    Returns:
+        tuple: (predicted_temp, predicted_precip, predicted_severity, date_seed)
+    """
+    temp, precip, severity, date_seed = scale_forecasts(
+        future_date, predicted_temp_raw, predicted_precip_raw, predicted_severity_raw
+    )
+    return (*clamp_inputs(temp, precip, severity), date_seed)
+
+def select_threat(ensemble_model, ohe_threat_type, le_threat_name, predicted_temp, predicted_precip,
+                  predicted_severity, future_date, date_seed, hour=None):
+    """
+    Pick the most likely threat from ensemble probabilities, with the
+    Deforestation damping and day-of-month diversity used by predict_threats.
+
+    Args:
+        hour (int, optional): Hour mixed into the tie-break seed (defaults to the current hour)
+
+    Returns:
+        str: The predicted threat name
+    """
+    if hour is None:
+        hour = datetime.now().hour
+
+    all_threats = ALL_THREATS
+
+    # Get day for diversity mechanisms
     day_value = future_date.day
-    
+
     # Try to predict threat using ensemble model
     try:
         # Input features for ensemble model prediction
@@ -192,6 +147,8 @@ def predict_threats(date_str):
                     [[predicted_temp, predicted_precip, predicted_severity]], 
                     threat_type_array
                 ])
+                if hasattr(ensemble_model, 'feature_names_in_'):
+                    ensemble_input = pd.DataFrame(ensemble_input, columns=ensemble_model.feature_names_in_)
                 
                 # Get probability for each threat class
                 if hasattr(ensemble_model, 'predict_proba'):
@@ -240,7 +197,7 @@ def predict_threats(date_str):
             # If we have multiple viable threats, use the date to select one
             if len(top_threats) > 1:
                 # Re-seed with date + hour to ensure different results
-                random.seed(date_seed + datetime.now().hour)
+                random.seed(date_seed + hour)
                 
                 # Weight selection by probability
                 weights = [t[1] for t in top_threats]
@@ -266,29 +223,23 @@ def predict_threats(date_str):
         # Fallback to day-based threat if ensemble fails
         day_influence = (day_value % 12)  # 0-11
         predicted_threat_name = all_threats[day_influence]
-    
-    predicted_threat_type = get_threat_type(predicted_threat_name)
-    
-    # For wildlife impact, map severity to categorical level
-    wildlife_mapping = {
-        1: "Very Low", 2: "Very Low",
-        3: "Low", 4: "Low",
-        5: "Medium", 6: "Medium",
-        7: "High", 8: "High",
-        9: "Severe", 10: "Severe"
-    }
-    predicted_wildlife = wildlife_mapping.get(predicted_severity, "Medium")
 
-    # Pass current temperature and precipitation to RL
-    # Get action suggestion from RL model
-    suggested_action = reinforce_predictions(predicted_threat_name, predicted_severity)
-    
-    forest_health_index = calculate_forest_health_index(predicted_temp, predicted_precip)
+    return predicted_threat_name
 
+def build_prediction_result(future_date, predicted_threat_name, predicted_temp, predicted_precip,
+                            predicted_severity, suggested_action):
+    """
+    Assemble the predict_threats result for one date, including the wildlife
+    impact mapping and the forest health index.
+
+    Returns:
+        dict: The prediction result with the date formatted as YYYY-MM-DD
+    """
+    forest_health_index = calculate_forest_health_index(predicted_temp, predicted_precip, future_date.month)
     return {
         'Most Likely Threat': predicted_threat_name,
-        'Threat Type': predicted_threat_type,
-        'Predicted Wildlife Impact': predicted_wildlife,
+        'Threat Type': get_threat_type(predicted_threat_name),
+        'Predicted Wildlife Impact': WILDLIFE_MAPPING.get(predicted_severity, "Medium"),
         'Predicted Temperature (°C)': round(predicted_temp, 1),
         'Predicted Precipitation (mm)': round(predicted_precip, 1),
         'Predicted Severity (1-10)': predicted_severity,
@@ -297,7 +248,83 @@ def predict_threats(date_str):
         'Date': future_date.strftime('%Y-%m-%d')
     }
 
+def alert_thresholds_met(prediction_result):
+    """Alert rules used by send_threat_alert: severity > 7, High/Severe wildlife impact or forest health index < 60."""
+    return (
+        prediction_result['Predicted Severity (1-10)'] > 7 or
+        prediction_result['Predicted Wildlife Impact'] in ['High', 'Severe'] or
+        prediction_result['Forest Health Index (0-100)'] < 60
+    )
+
+def predict_threats(date_str, monitor=None):
+    """
+    Predict the most likely threat, conditions and suggested action for a date.
+
+    Args:
+        date_str (str): Date in format "DD Month" or "DD Month YYYY"
+        monitor (DriftMonitor, optional): Receives the inputs before clamping and the
+            ensemble's threat, the same quantities the reference profile is built from
+
+    Returns:
+        dict: The prediction result
+    """
+    if len(date_str.split()) == 2:
+        current_year = datetime.now().year
+        date_str += f" {current_year}"
+
+    # Load models and encoders with improved error handling
+    try:
+        ensemble_model = joblib.load('../models/ensemble_model.joblib')
+        
+        # Prophet models
+        try:
+            temp_model, precip_model, severity_model, wildlife_model = joblib.load('../models/prophet_models.joblib')
+        except Exception as e:
+            print(f"Error loading prophet models: {e}")
+            raise
+        
+        ohe_threat_type, le_threat_name = load_encoders()
+
+    except Exception as e:
+        print(f"Error loading models: {e}")
+        raise
+
+    future_date = pd.to_datetime(date_str, format='%d %B %Y')
+    future_temp_df = pd.DataFrame({'ds': [future_date]})
+    future_precip_df = pd.DataFrame({'ds': [future_date]})
+    future_severity_df = pd.DataFrame({'ds': [future_date]})
+
+    # Get raw predictions
+    predicted_temp_raw = temp_model.predict(future_temp_df)['yhat'].values[0]
+    predicted_precip_raw = precip_model.predict(future_precip_df)['yhat'].values[0]
+    predicted_severity_raw = severity_model.predict(future_severity_df)['yhat'].values[0]
+
+    temp, precip, severity, date_seed = scale_forecasts(
+        future_date, predicted_temp_raw, predicted_precip_raw, predicted_severity_raw
+    )
+    predicted_temp, predicted_precip, predicted_severity = clamp_inputs(temp, precip, severity)
+
+    predicted_threat_name = select_threat(
+        ensemble_model, ohe_threat_type, le_threat_name,
+        predicted_temp, predicted_precip, predicted_severity, future_date, date_seed
+    )
+    if monitor is not None:
+        # The reference counts the damped ensemble argmax, not select_threat's boosted draw
+        proba = threat_probabilities(ensemble_model, threat_type_rows(ohe_threat_type), le_threat_name.classes_,
+                                     [[predicted_temp, predicted_precip, predicted_severity]])[0]
+        monitor.observe(temp, precip, severity, le_threat_name.classes_[proba.argmax()])
+
+    # Pass current temperature and precipitation to RL
+    # Get action suggestion from RL model
+    suggested_action = reinforce_predictions(predicted_threat_name, predicted_severity)
+
+    return build_prediction_result(
+        future_date, predicted_threat_name, predicted_temp, predicted_precip, predicted_severity, suggested_action
+    )
+
 if __name__ == "__main__":
+    from twilio_alerts import send_threat_alert
+
     try:
         future_date_input = input("Enter a future date: ")
         prediction_result = predict_threats(future_date_input)